@@ -0,0 +1,308 @@
+"""Benchmarks for the modules in this repository
+
+Run all of them with `python benchmark.py`, or name the ones to run, e.g.
+`python benchmark.py bitstream`. Each benchmark prints one line per
+variant so the numbers can be compared across releases.
+
+Functions:
+    timed: runs a function and returns the best wall time of a few runs
+    report: prints one benchmark result line
+    reportrate: prints one benchmark result line as operations per second
+    BaselineBitstream: the original Bitstream, one file read or write per
+                       byte, kept as the baseline for bench_bitstream
+    bench_bitstream: the original bit-at-a-time Bitstream vs. putbit,
+                     getbit and bulk I/O on the buffered Bitstream
+    sample_text: returns size bytes of text from wordlist.txt
+    compress: compresses one file with the Huffman class
+    bench_decode: tree-walking vs. table-driven Huffman decoding
+    bench_encode: per-symbol putcode calls vs. chunked Huffman encoding
+    bench_calculator: parsing every call vs. cached and compiled
+                      Calculator expressions
+    distributions: returns the sort benchmark inputs by name
+    bench_sort: quick_insertion with a fixed and a calibrated limit vs.
+                sorted(), as a table of milliseconds
+    main: runs the benchmarks named on the command line
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+from bitstream import Bitstream
+from calculator import Calculator
+from huffman import Huffman
+from quickinsertion import autolimit, quick_insertion
+
+
+def timed(func, repeat=3):
+    """runs func repeat times and returns the best wall time in seconds"""
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def report(name, nbytes, seconds):
+    """prints one result line as MB/s"""
+    print("{0:<40} {1:>10.2f} MB/s".format(name, nbytes / seconds / 1e6))
+
+
+def reportrate(name, count, seconds):
+    """prints one result line as operations per second"""
+    print("{0:<40} {1:>10.0f} ops/s".format(name, count / seconds))
+
+
+class BaselineBitstream:
+    """the original Bitstream's putbit/getbit: one byte buffer, written to
+    or read from the file every 8 bits"""
+
+    def __init__(self, filename, rw):
+        """opens filename for reading ('r') or writing ('w')"""
+        self.file = open(filename, 'rb' if rw == 'r' else 'wb')
+        self.rw = rw
+        self.bytebuffer = bytearray(1)
+        self.bitpos = 0
+
+    def putbit(self, c):
+        """writes bit c"""
+        if c == 1:
+            self.bytebuffer[0] = self.bytebuffer[0] | (1 << self.bitpos)
+        elif c == 0:
+            self.bytebuffer[0] = self.bytebuffer[0] & ~(1 << self.bitpos)
+        self.bitpos += 1
+        if self.bitpos > 7:
+            self.file.write(self.bytebuffer)
+            self.bitpos = 0
+
+    def getbit(self):
+        """returns the next bit, None at the end of the file"""
+        if self.bitpos == 0:
+            char = self.file.read(1)
+            if len(char) == 0:
+                return None
+            self.bytebuffer[0] = ord(char)
+        b = (self.bytebuffer[0] & (1 << self.bitpos)) >> self.bitpos
+        self.bitpos += 1
+        if self.bitpos > 7:
+            self.bitpos = 0
+        return b
+
+    def close(self):
+        """writes the last partial byte and closes the file"""
+        if self.rw == 'w' and self.bitpos != 0:
+            self.file.write(self.bytebuffer)
+        self.file.close()
+
+
+def bench_bitstream(size=1 << 20):
+    """writes and reads size bytes of random data bit by bit through the
+    original Bitstream and through the buffered one, and in bulk through
+    the buffered one
+    """
+    rng = random.Random(0)
+    data = bytes(rng.getrandbits(8) for i in range(size))
+    tmpdir = tempfile.TemporaryDirectory()
+    path = os.path.join(tmpdir.name, 'bits.bin')
+
+    def write_bits(cls):
+        bs = cls(path, 'w')
+        for byte in data:
+            for i in range(8):
+                bs.putbit((byte >> i) & 1)
+        bs.close()
+
+    def read_bits(cls):
+        bs = cls(path, 'r')
+        while bs.getbit() is not None:
+            pass
+        bs.close()
+
+    def write_bulk():
+        bs = Bitstream(path, 'w')
+        for i in range(0, size, 8):
+            bs.putbits(int.from_bytes(data[i:i + 8], 'little'), 64)
+        bs.close()
+
+    def read_bulk():
+        bs = Bitstream(path, 'r')
+        while bs.getbits(64) is not None:
+            pass
+        bs.close()
+
+    report('bitstream write, original putbit', size,
+           timed(lambda: write_bits(BaselineBitstream), 1))
+    report('bitstream read, original getbit', size,
+           timed(lambda: read_bits(BaselineBitstream), 1))
+    report('bitstream write, buffered putbit', size,
+           timed(lambda: write_bits(Bitstream), 1))
+    report('bitstream read, buffered getbit', size,
+           timed(lambda: read_bits(Bitstream), 1))
+    report('bitstream write, putbits(64)', size, timed(write_bulk))
+    report('bitstream read, getbits(64)', size, timed(read_bulk))
+    tmpdir.cleanup()
+
+
+def sample_text(size):
+    """returns size bytes of text taken from wordlist.txt"""
+    with open('wordlist.txt', 'rb') as file:
+        text = file.read()
+    return (text * (size // len(text) + 1))[:size]
+
+
+def compress(infile, outfile, canonical=False):
+    """compresses infile into outfile with the Huffman class"""
+    h = Huffman(infile, outfile, canonical)
+    h.count()
+    h.buildtree()
+    h.putheader()
+    h.encode()
+    h.bsIn.close()
+
+
+def bench_decode(size=1 << 20):
+    """decodes size bytes of compressed text by walking the tree one bit
+    at a time and by table lookups
+    """
+    tmpdir = tempfile.TemporaryDirectory()
+    plain = os.path.join(tmpdir.name, 'plain.txt')
+    packed = os.path.join(tmpdir.name, 'plain.huf')
+    with open(plain, 'wb') as file:
+        file.write(sample_text(size))
+    canon = os.path.join(tmpdir.name, 'plain.chuf')
+    compress(plain, packed)
+    compress(plain, canon, canonical=True)
+
+    def decode(method, infile=packed):
+        h = Huffman(infile, os.path.join(tmpdir.name, 'out.txt'))
+        h.getheader()
+        getattr(h, method)()
+        h.bsIn.close()
+
+    report('huffman decode, bit at a time', size,
+           timed(lambda: decode('decodebits'), 1))
+    report('huffman decode, table driven', size,
+           timed(lambda: decode('decode')))
+    report('huffman decode, canonical table', size,
+           timed(lambda: decode('decode', canon)))
+    tmpdir.cleanup()
+
+
+def bench_encode(size=1 << 20):
+    """encodes size bytes of text one putcode call per symbol and in
+    chunks with Huffman.encode
+    """
+    tmpdir = tempfile.TemporaryDirectory()
+    plain = os.path.join(tmpdir.name, 'plain.txt')
+    packed = os.path.join(tmpdir.name, 'plain.huf')
+    with open(plain, 'wb') as file:
+        file.write(sample_text(size))
+
+    def encode(chunked):
+        h = Huffman(plain, packed)
+        h.count()
+        h.buildtree()
+        h.putheader()
+        if chunked:
+            h.encode()
+        else:
+            for c in h.bsIn.getbytes(size):
+                h.putcode(c)
+            h.putcode(256)
+            h.bsOut.close()
+        h.bsIn.close()
+
+    report('huffman encode, putcode per symbol', size,
+           timed(lambda: encode(False), 1))
+    report('huffman encode, chunked', size, timed(lambda: encode(True)))
+    tmpdir.cleanup()
+
+
+def bench_calculator(count=20000):
+    """evaluates a few formulas count times in total, parsing them on
+    every call, through the expression cache, by interpreting the postfix
+    form, and precompiled
+    """
+    formulas = ['1+2*3-4/5*x', '2^10-1000*y', '(x+2.5)*(3-y)/4',
+                'x*x*x*x+2*2*2-y', '-(x-y)^2+3*x-2*y+1']
+    variables = {'x': 1.5, 'y': 2.0}
+    exprs = [formulas[i % len(formulas)] for i in range(count)]
+    compiled = [Calculator.compile(e) for e in formulas]
+    postfix = [c.postfix for c in compiled]
+    postfix = [postfix[i % len(formulas)] for i in range(count)]
+    compiled = [compiled[i % len(formulas)] for i in range(count)]
+
+    def parse_each():
+        for e in exprs:
+            Calculator.evaluate(Calculator.in_to_post(e), variables)
+
+    def cached():
+        for e in exprs:
+            Calculator.calculate(e, variables)
+
+    def interpreted():
+        for p in postfix:
+            Calculator.evaluate(p, variables)
+
+    def precompiled():
+        for c in compiled:
+            c.evaluate(variables)
+
+    reportrate('calculator, parse every call', count, timed(parse_each))
+    reportrate('calculator, cached calculate', count, timed(cached))
+    reportrate('calculator, postfix interpreter', count, timed(interpreted))
+    reportrate('calculator, compiled evaluate', count, timed(precompiled))
+
+
+def distributions(size, rng):
+    """returns the sort benchmark inputs of size values by name"""
+    half = size // 2
+    return {
+        'random': [rng.random() for i in range(size)],
+        'sorted': list(range(size)),
+        'reversed': list(range(size, 0, -1)),
+        'organ-pipe': list(range(half)) + list(range(size - half, 0, -1)),
+        'few-unique': [rng.randrange(8) for i in range(size)],
+    }
+
+
+def bench_sort(sizes=(1000, 10000, 100000)):
+    """sorts several distributions of values at several sizes with
+    sorted() and quick_insertion, with limit 16 and the calibrated limit
+    """
+    rng = random.Random(0)
+    print("{0:<12} {1:>8} {2:>10} {3:>10} {4:>10} {5:>6}".format(
+        'sort', 'size', 'sorted()', 'limit 16', 'auto', 'limit'))
+    for size in sizes:
+        for name, values in distributions(size, rng).items():
+            limit = autolimit(values)
+            times = [timed(lambda: sorted(values)),
+                     timed(lambda: quick_insertion(list(values), 16)),
+                     timed(lambda: quick_insertion(list(values), 'auto'))]
+            print("{0:<12} {1:>8} {2:>10.2f} {3:>10.2f} {4:>10.2f} "
+                  "{5:>6}".format(name, size, *[t * 1e3 for t in times],
+                                  limit))
+
+
+benchmarks = {
+    'bitstream': bench_bitstream,
+    'decode': bench_decode,
+    'encode': bench_encode,
+    'calculator': bench_calculator,
+    'sort': bench_sort,
+}
+
+
+def main(argv):
+    """runs the benchmarks named in argv (all of them if none are named)"""
+    for name in argv or list(benchmarks):
+        benchmarks[name]()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
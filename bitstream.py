@@ -1,102 +1,251 @@
-"""
-This is a bitstream class for bit manipulation.
-
-Methods:
-    __init__: initializes the bistream object; accepts a filename and
-             read/write specification; opens the file
-    __str__: returns the current byte buffer
-    __len__: returns the number of bytes in the bitstream
-    flush: zeroes out remaining bits and writes byte buffer to the file
-    putbit: accepts a bit c; writes c to the file
-    getbit: reads the next bit from a file
-    putint: accepts an integer (n) and number of bits (numbits); writes
-            n to the file using numbits bits
-    getint: accepts number of bits (numbits); gets numbits bits from
-        the file and returns the corresponding integer (or None)
-    close: flushes the last byte (if needed) and closes the file
-"""
-
-
-class Bitstream:
-
-    def __init__(self, filename, rw):
-        """Create a bitstream object, read from/write to filename"""
-        if rw == "r":
-            self.filename = open(filename, 'rb')
-            self.rw = 'r'
-        elif rw == "w":
-            self.filename = open(filename, 'wb')
-            self.rw = 'w'
-        self.bytebuffer = bytearray(1)
-        self.bitpos = 0
-        self.size = 0
-
-    def __str__(self):
-        """return current byte buffer (for printing), 8 bits, most
-           significant to least significant
-        """
-        bit = ''
-        for i in range(7, -1, -1):
-            x = (self.bytebuffer[0] & 1 << i) >> i
-            bit += str(x)
-        return bit
-
-    def __len__(self):
-        """return the number of bytes in the bitstream"""
-        return self.size
-
-    def flush(self):
-        """zero out remaining bits, write byte buffer to file"""
-        self.bytebuffer[0] = (self.bytebuffer[0] <<
-                              self.bitpos) >> self.bitpos
-        self.filename.write(self.bytebuffer)
-
-    def putbit(self, c):
-        """write bit c to file (for writing)"""
-        if c == 1:
-            self.bytebuffer[0] = self.bytebuffer[0] | (1 << self.bitpos)
-        elif c == 0:
-            self.bytebuffer[0] = self.bytebuffer[0] & ~(1 << self.bitpos)
-        self.bitpos += 1
-        if self.bitpos > 7:
-            self.filename.write(self.bytebuffer)
-            self.bitpos = 0
-
-    def getbit(self):
-        """return next bit from file (for reading)"""
-        if self.bitpos == 0:
-            char = self.filename.read(1)
-            if len(char) == 0:
-                return None
-            self.bytebuffer[0] = ord(char)
-        b = (self.bytebuffer[0] & (1 << self.bitpos)) >> self.bitpos
-        self.bitpos += 1
-        if self.bitpos > 7:
-            self.bitpos = 0
-        return b
-
-    def putint(self, n, numbits):
-        """write integer n into file using numbits bits"""
-        for i in range(numbits):
-            bit = (n & (1 << i)) >> i
-            self.putbit(bit)
-        self.size += 1
-
-    def getint(self, numbits):
-        """get numbits bits from the file; return the corresponding
-           integer; return None if at end of file
-        """
-        n = 0
-        for i in range(numbits):
-            b = self.getbit()
-            if b is None:
-                return None
-            n += b * 2 ** i
-        self.size += 1
-        return n
-
-    def close(self):
-        """flush last byte if necessary and close the file"""
-        if self.rw == 'w' and self.bitpos != 0:
-            self.flush()
-        self.filename.close()
+"""
+This is a bitstream class for bit manipulation.
+
+Bits are packed least significant bit first. Instead of touching the file
+for every byte, the bitstream collects bits in an integer accumulator and
+moves whole bytes through an internal bytearray of bufsize bytes, so the
+bulk methods (putbits/getbits/peekbits/putbytes/getbytes) handle many bits
+in one call. The file format is the same as the old byte-at-a-time stream.
+
+A bitstream reads from a file, a file-like object, a bytes-like object
+(without copying it) or a read-only memory map of a file, and writes to a
+file or any object with a write method such as io.BytesIO.
+
+Methods:
+    __init__: initializes the bistream object; accepts a filename,
+             file-like or bytes-like source, read/write specification,
+             optional buffer size and memory-map flag; opens the file
+    __str__: returns the current byte buffer
+    __len__: returns the number of bytes in the bitstream
+    flush: zeroes out remaining bits and writes the buffer to the file
+    putbit: accepts a bit c; writes c to the file
+    getbit: reads the next bit from a file
+    putbits: accepts an integer (value) and number of bits (n); writes
+             the low n bits of value in one operation
+    getbits: accepts number of bits (n); returns the next n bits as an
+             integer (or None)
+    peekbits: accepts number of bits (n); returns the next n bits
+              without consuming them
+    putbytes: accepts a bytes-like object; writes all of its bytes
+    getbytes: accepts a byte count (n); returns up to n bytes
+    putint: accepts an integer (n) and number of bits (numbits); writes
+            n to the file using numbits bits
+    getint: accepts number of bits (numbits); gets numbits bits from
+        the file and returns the corresponding integer (or None)
+    close: flushes the last byte (if needed) and closes the file
+"""
+
+import mmap
+import os
+
+# default size of the internal byte buffer
+BUFSIZE = 1 << 16
+
+
+class Bitstream:
+
+    def __init__(self, source, rw, bufsize=BUFSIZE, mapped=False):
+        """Create a bitstream object, read from/write to source
+
+        source is a filename, a file-like object with read/write methods,
+        or (for reading) a bytes, bytearray or memoryview; with mapped
+        set, a file opened for reading is memory-mapped instead of read
+        """
+        self.file = None
+        self.mmap = None
+        # Only close files this bitstream opened itself
+        self.owned = False
+        # Whole bytes waiting to be written / not yet moved into acc
+        self.buffer = bytearray()
+        if rw == "r":
+            self.rw = 'r'
+            if isinstance(source, (bytes, bytearray, memoryview)):
+                self.buffer = memoryview(source).cast('B')
+            elif isinstance(source, (str, os.PathLike)):
+                self.file = open(source, 'rb')
+                self.owned = True
+                if mapped and os.fstat(self.file.fileno()).st_size > 0:
+                    self.mmap = mmap.mmap(self.file.fileno(), 0,
+                                          access=mmap.ACCESS_READ)
+                    self.buffer = memoryview(self.mmap)
+                    self.file.close()
+                    self.file = None
+                    self.owned = False
+            else:
+                self.file = source
+        elif rw == "w":
+            self.rw = 'w'
+            if isinstance(source, (str, os.PathLike)):
+                self.file = open(source, 'wb')
+                self.owned = True
+            else:
+                self.file = source
+        self.bufsize = max(1, bufsize)
+        # Pending bits, least significant bit first
+        self.acc = 0
+        self.nbits = 0
+        self.pos = 0
+        self.size = 0
+
+    def _read(self, n):
+        """read the next n bytes of the underlying file; in-memory and
+           memory-mapped sources are already fully in the buffer
+        """
+        if self.file is None:
+            return b''
+        return self.file.read(n)
+
+    def __str__(self):
+        """return current byte buffer (for printing), 8 bits, most
+           significant to least significant
+        """
+        if self.rw == 'w':
+            byte = (self.acc >> (self.nbits & ~7)) & 0xff
+        else:
+            byte = self.peekbits(8)
+        return format(byte, '08b')
+
+    def __len__(self):
+        """return the number of bytes in the bitstream"""
+        return self.size
+
+    def _spill(self):
+        """move the whole bytes in the accumulator into the buffer and
+           write the buffer to the file once it holds bufsize bytes
+        """
+        nbytes = self.nbits >> 3
+        if nbytes:
+            self.buffer += (self.acc & ((1 << (nbytes << 3)) - 1)).to_bytes(
+                nbytes, 'little')
+            self.acc >>= nbytes << 3
+            self.nbits &= 7
+        if len(self.buffer) >= self.bufsize:
+            self.file.write(self.buffer)
+            self.buffer = bytearray()
+
+    def _fill(self, n):
+        """move bytes from the buffer (reading more of the file when it
+           runs dry) into the accumulator until it holds n bits; return
+           False if the file ends first
+        """
+        while self.nbits < n:
+            if self.pos >= len(self.buffer):
+                self.buffer = self._read(max(self.bufsize,
+                                             (n - self.nbits + 7) >> 3))
+                self.pos = 0
+                if len(self.buffer) == 0:
+                    return False
+            take = max(8, (n - self.nbits + 7) >> 3)
+            chunk = self.buffer[self.pos:self.pos + take]
+            self.pos += len(chunk)
+            self.acc |= int.from_bytes(chunk, 'little') << self.nbits
+            self.nbits += len(chunk) << 3
+        return True
+
+    def flush(self):
+        """zero out remaining bits, write byte buffer to file"""
+        if self.nbits & 7:
+            self.nbits += 8 - (self.nbits & 7)
+        self._spill()
+        self.file.write(self.buffer)
+        self.buffer = bytearray()
+
+    def putbit(self, c):
+        """write bit c to file (for writing)"""
+        self.putbits(c, 1)
+
+    def getbit(self):
+        """return next bit from file (for reading)"""
+        return self.getbits(1)
+
+    def putbits(self, value, n):
+        """write the low n bits of value to file (for writing)"""
+        self.acc |= (value & ((1 << n) - 1)) << self.nbits
+        self.nbits += n
+        if self.nbits >= 64:
+            self._spill()
+
+    def getbits(self, n):
+        """return the next n bits from file as an integer; return None if
+           fewer than n bits are left
+        """
+        if self.nbits < n and not self._fill(n):
+            return None
+        value = self.acc & ((1 << n) - 1)
+        self.acc >>= n
+        self.nbits -= n
+        return value
+
+    def peekbits(self, n):
+        """return the next n bits from file without consuming them; bits
+           past the end of the file read as zeros
+        """
+        if self.nbits < n:
+            self._fill(n)
+        return self.acc & ((1 << n) - 1)
+
+    def putbytes(self, data):
+        """write every byte of data to file (for writing)"""
+        if self.nbits & 7:
+            self.putbits(int.from_bytes(data, 'little'), len(data) << 3)
+            return
+        self._spill()
+        self.buffer += data
+        if len(self.buffer) >= self.bufsize:
+            self.file.write(self.buffer)
+            self.buffer = bytearray()
+
+    def getbytes(self, n):
+        """return up to n bytes from file; return an empty bytes object
+           at end of file
+        """
+        if self.nbits & 7 or self.nbits >= n << 3:
+            if self.nbits < n << 3:
+                self._fill(n << 3)
+            n = min(n, self.nbits >> 3)
+            return self.getbits(n << 3).to_bytes(n, 'little')
+        # byte aligned: hand out the accumulator, then slice the buffer
+        parts = [self.acc.to_bytes(self.nbits >> 3, 'little')]
+        n -= self.nbits >> 3
+        self.acc = 0
+        self.nbits = 0
+        while n > 0:
+            if self.pos >= len(self.buffer):
+                self.buffer = self._read(max(self.bufsize, n))
+                self.pos = 0
+                if len(self.buffer) == 0:
+                    break
+            chunk = self.buffer[self.pos:self.pos + n]
+            self.pos += len(chunk)
+            n -= len(chunk)
+            parts.append(chunk)
+        return b''.join(parts)
+
+    def putint(self, n, numbits):
+        """write integer n into file using numbits bits"""
+        self.putbits(n, numbits)
+        self.size += 1
+
+    def getint(self, numbits):
+        """get numbits bits from the file; return the corresponding
+           integer; return None if at end of file
+        """
+        n = self.getbits(numbits)
+        if n is None:
+            return None
+        self.size += 1
+        return n
+
+    def close(self):
+        """flush last byte if necessary and close the file (files and
+           sinks passed in by the caller are flushed but left open)
+        """
+        if self.rw == 'w':
+            self.flush()
+        if isinstance(self.buffer, memoryview):
+            self.buffer.release()
+            self.buffer = b''
+        if self.mmap is not None:
+            self.mmap.close()
+        if self.owned:
+            self.file.close()
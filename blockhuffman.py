@@ -0,0 +1,114 @@
+"""
+This program compresses files as a series of independently Huffman coded
+blocks, so that the blocks can be coded on all CPU cores at once and any
+single block can be decompressed on its own.
+
+File layout (integers are little endian):
+    header: the magic bytes, a 1-byte version and the 4-byte block size
+    blocks: each block compressed with huffman.compressbytes (canonical
+            format, with its own code lengths)
+    index: for every block its 8-byte offset, 4-byte compressed length
+           and 4-byte original length
+    trailer: the 8-byte index offset, 4-byte block count and the magic
+             bytes again
+
+Functions:
+    compress: accepts an input file name and output file name; compresses
+              the input block by block
+    readindex: accepts an open compressed file; returns the block size and
+               the block index
+    readblock: accepts a compressed file name and block number; returns
+               that block decompressed
+    decompress: accepts an input file name and output file name;
+                decompresses every block
+"""
+import struct
+
+from huffman import compressbytes, decompressbytes
+from pipeline import pipeline
+
+MAGIC = b'HUFB'
+VERSION = 1
+# Default number of input bytes per block
+BLOCKSIZE = 1 << 20
+
+HEADER = struct.Struct('<4sBI')
+ENTRY = struct.Struct('<QII')
+TRAILER = struct.Struct('<QI4s')
+
+
+def _blocks(file, blocksize):
+    """Yield the blocks of an open file"""
+    while True:
+        block = file.read(blocksize)
+        if len(block) == 0:
+            break
+        yield block
+
+
+def _compressblock(block):
+    """Compress one block, returning it with its original length"""
+    return compressbytes(block), len(block)
+
+
+def compress(infile, outfile, blocksize=BLOCKSIZE, workers=None):
+    """Compress infile into outfile in blocks of blocksize bytes, coding
+       the blocks on workers processes
+    """
+    index = []
+    with open(infile, 'rb') as fileIn, open(outfile, 'wb') as fileOut:
+        fileOut.write(HEADER.pack(MAGIC, VERSION, blocksize))
+        offset = HEADER.size
+        for data, length in pipeline(_compressblock,
+                                     _blocks(fileIn, blocksize), workers):
+            fileOut.write(data)
+            index.append((offset, len(data), length))
+            offset += len(data)
+        for entry in index:
+            fileOut.write(ENTRY.pack(*entry))
+        fileOut.write(TRAILER.pack(offset, len(index), MAGIC))
+
+
+def readindex(file):
+    """Return the block size and the list of (offset, compressed length,
+       original length) entries of the open compressed file
+    """
+    file.seek(0)
+    magic, version, blocksize = HEADER.unpack(file.read(HEADER.size))
+    if magic != MAGIC:
+        raise ValueError("not a block compressed file")
+    if version != VERSION:
+        raise ValueError("unknown block format version {0}".format(version))
+    file.seek(-TRAILER.size, 2)
+    offset, count, magic = TRAILER.unpack(file.read(TRAILER.size))
+    if magic != MAGIC:
+        raise ValueError("truncated block compressed file")
+    file.seek(offset)
+    data = file.read(count * ENTRY.size)
+    return blocksize, list(ENTRY.iter_unpack(data))
+
+
+def readblock(infile, i):
+    """Return block i of the compressed file infile, decompressed"""
+    with open(infile, 'rb') as file:
+        offset, length, size = readindex(file)[1][i]
+        file.seek(offset)
+        return decompressbytes(file.read(length))
+
+
+def _readblocks(file, index):
+    """Yield the compressed blocks of an open file"""
+    for offset, length, size in index:
+        file.seek(offset)
+        yield file.read(length)
+
+
+def decompress(infile, outfile, workers=None):
+    """Decompress the block compressed file infile into outfile, decoding
+       the blocks on workers processes
+    """
+    with open(infile, 'rb') as fileIn, open(outfile, 'wb') as fileOut:
+        index = readindex(fileIn)[1]
+        for block in pipeline(decompressbytes, _readblocks(fileIn, index),
+                              workers):
+            fileOut.write(block)
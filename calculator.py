@@ -1,218 +1,761 @@
-"""Converts an infix expression to postfix and evaluates it
-
-Stack: list that follows the LIFO principle
-    __init__: initializes the stack
-    __str__: displays the stack
-    isEmpty: determines if the stack is empty
-    push: adds an element to the stack
-    peek: looks at the element on top of the stack (without removal)
-    pop: removes/returns the element from the top of the stack
-    size: determines the number of elements in the stack
-
-Calculator: houses the infix to postfix conversion and evaluation
-    in_to_post: converts an infix expression to postfix
-    evaluate: evaluates the postfix expression
-    claculate: wrapper for in_to_post and evaluate
-"""
-
-import math
-
-
-class Stack:
-    """list that follows the LIFO principle; for use in Calculator methods"""
-
-    def __init__(self):
-        """initializes the stack"""
-        self.elements = []
-
-    def __str__(self):
-        """displays the stack"""
-        return str(self.elements)
-
-    def isEmpty(self):
-        """determines if a stack is empty"""
-        if self.elements == []:
-            return True
-        else:
-            return False
-
-    def push(self, element):
-        """adds an element to the stack"""
-        self.elements.append(element)
-
-    def peek(self):
-        """looks at the element on top of the stack (without removing it)"""
-        return self.elements[-1]
-
-    def pop(self):
-        """removes the element from the top of the stack"""
-        return self.elements.pop()
-
-    def size(self):
-        """determines the number of elements in the stack"""
-        return len(self.elements)
-
-
-class Calculator:
-    """houses the infix to postfix conversion and evaluation"""
-
-    # dictionary for the operators
-    operators = {
-        '+': (1, 1),
-        '-': (2, 1),
-        '*': (3, 1),
-        '/': (4, 1),
-        '^': (5, 1),
-        '!': (6, 1)
-    }
-    # dictionary for the parentheses
-    parens = {
-        '(': (7, 1),
-        ')': (8, 1)
-    }
-    # precedence table (incoming token->first column, onstack token->first row)
-    precedence = [
-        [' ',     '+',     '-',     '*',     '/',     '^',     '!',     '('     ')'],
-        ['+',   False,   False,   False,   False,   False,   False,    True,   True],
-        ['-',   False,   False,   False,   False,   False,   False,    True,   True],
-        ['*',    True,    True,   False,   False,   False,   False,    True,   True],
-        ['/',    True,    True,   False,   False,   False,   False,    True,   True],
-        ['^',    True,    True,    True,    True,   False,   False,    True,   True],
-        ['!',    True,    True,    True,    True,    True,   False,    True,   True],
-        ['(',    True,    True,    True,    True,    True,    True,    True,   True],
-        [')',    False,  False,   False,   False,   False,   False,    True,   True],
-    ]
-    # list of number characters
-    num = ['0', '1', '2', '3', '4', '5', '6', '7', '8', '9', '.']
-
-    @classmethod
-    def in_to_post(cls, e):
-        """converts infix expression to postfix expression (while tokenizing the
-        elements) using the Shunting Yard Algorithm"""
-        ops = Stack()
-        out = []
-        neg = Stack()
-        store = []
-        e = e.replace(' ', '')
-
-        for i in range(len(e)):
-            if e[i] in cls.num:
-                if i != (len(e) - 1) and e[i + 1] in cls.num:
-                    store.append(e[i])
-                elif store != []:
-                    store.append(e[i])
-                    s = ''.join(store)
-                    store = []
-                    if neg.isEmpty() is False:
-                        neg.pop()
-                        t = (-float(s), 0)
-                    else:
-                        t = (float(s), 0)
-                    out.append(t)
-                else:
-                    if not neg.isEmpty():
-                        neg.pop()
-                        t = (-float(e[i]), 0)
-                        out.append(t)
-                    else:
-                        out.append((float(e[i]), 0))
-            elif e[i] in cls.operators:
-                x = cls.operators[e[i]]
-                if i + 2 < len(e):
-                    if e[i + 1] in cls.operators:
-                        return 'Error: Consecutive Operators'
-                if x == (2, 1):
-                    if i == 0:
-                        neg.push(e[i])
-                    elif e[i - 1] in cls.num:
-                        if ops.isEmpty:
-                            ops.push(x)
-                        else:
-                            for i in range(ops.size()):
-                                if not cls.precedence[int(x[0])][int(ops.peek()[0])]:
-                                    z = ops.pop()
-                                    out.append(z)
-                            ops.push(x)
-                    elif e[i - 1] in cls.parens and cls.parens[e[i - 1]] == (8, 1):
-                        if ops.isEmpty:
-                            ops.push(x)
-                        else:
-                            for i in range(ops.size()):
-                                if not cls.precedence[int(x[0])][int(ops.peek()[0])]:
-                                    z = ops.pop()
-                                    out.append(z)
-                            ops.push(x)
-                    else:
-                        neg.push(e[i])
-                else:
-                    if ops.isEmpty:
-                        ops.push(x)
-                    else:
-                        for i in range(ops.size()):
-                            if not cls.precedence[int(x[0])][int(ops.peek()[0])]:
-                                z = ops.pop()
-                                out.append(z)
-                        ops.push(x)
-            elif e[i] in cls.parens:
-                q = cls.parens[e[i]]
-                if q == (7, 1):
-                    ops.push(q)
-                elif q == (8, 1):
-                    if ops.isEmpty:
-                        return 'Error: Mismatched Parentheses'
-                    else:
-                        while ops.peek() != (7, 1):
-                            w = ops.pop()
-                            out.append(w)
-                            if ops.isEmpty:
-                                return 'Error: Mismatched Parentheses'
-                        if ops.peek() == (7, 1):
-                            ops.pop()
-        while not ops.isEmpty():
-            u = ops.pop()
-            out.append(u)
-        return out
-
-    @classmethod
-    def evaluate(cls, out):
-        """evaulates postfix expression"""
-        if out == 'Error: Consecutive Operators' or out == 'Error: Mismatched Parentheses':
-            return out
-        numbers = Stack()
-        for i in out:
-            if i[1] == 0:
-                numbers.push((i)[0])
-            else:
-                if i == (7, 1):
-                    return 'Error: Mismatched Parentheses'
-                if i == (1, 1):
-                    value = numbers.pop() + numbers.pop()
-                    numbers.push(value)
-                elif i == (2, 1):
-                    value = -numbers.pop() + numbers.pop()
-                    numbers.push(value)
-                elif i == (3, 1):
-                    value = numbers.pop() * numbers.pop()
-                    numbers.push(value)
-                elif i == (4, 1):
-                    x = numbers.pop()
-                    y = numbers.pop()
-                    value = y / x
-                    numbers.push(value)
-                elif i == (5, 1):
-                    x = numbers.pop()
-                    y = numbers.pop()
-                    value = y ** x
-                    numbers.push(value)
-                elif i == (6, 1):
-                    value = math.factorial(numbers.pop())
-                    numbers.push(value)
-        if numbers.size() > 1:
-            return 'Input Error'
-        else:
-            return numbers.pop()
-
-    @classmethod
-    def calculate(cls, e):
-        """wrapper for in_to_post() and evaluate()"""
-        return cls.evaluate(cls.in_to_post(e))
+"""Converts an infix expression to postfix and evaluates it
+
+Stack: list that follows the LIFO principle
+    __init__: initializes the stack
+    __str__: displays the stack
+    isEmpty: determines if the stack is empty
+    push: adds an element to the stack
+    peek: looks at the element on top of the stack (without removal)
+    pop: removes/returns the element from the top of the stack
+    size: determines the number of elements in the stack
+
+CalcError: error found while parsing or evaluating an expression
+    __init__: stores the message and the position in the expression
+    __str__: displays the message
+    __repr__: displays the message and position
+    __eq__: compares the message with a string or another error
+    __hash__: hashes the message
+
+ExpressionCache: bounded least-recently-used cache of parsed expressions
+    __init__: initializes an empty cache holding up to maxsize entries
+    __len__: returns the number of cached entries
+    get: returns the cached entry for a key (or None), counting hits and
+         misses
+    put: adds an entry, evicting the least recently used one when full
+    clear: empties the cache and resets the statistics
+    stats: returns the hit/miss/eviction counts and the cache size
+
+factorial: returns the factorial of a whole number (a float for floats),
+           remembering the most recently used small results
+
+Calculator: houses the infix to postfix conversion and evaluation;
+            expressions may use named variables such as x*2+y^2, and
+            are evaluated with float, Decimal or Fraction arithmetic
+    in_to_post: converts an infix expression to postfix in one pass over
+                its tokens
+    evaluate: evaluates the postfix expression, given the values of its
+              variables
+    evaluate_batch: evaluates the postfix expression over columns of
+                    variable values, an operator at a time (vectorized
+                    with NumPy when it is installed)
+    apply_batch: applies an operator elementwise to columns and numbers
+    fold: folds the constant subexpressions of a postfix expression
+    fold_op: applies one operator while folding, replacing its constant
+             operands with the result
+    lower: turns a postfix expression into a Python function
+    compile: returns the parsed (and cached) form of an expression
+    claculate: wrapper for in_to_post and evaluate
+
+CompiledExpression: an expression parsed once and evaluated many times
+    __init__: stores the expression and its postfix form
+    lower: folds the postfix form and lowers it to a Python function
+           (compile() does it at once, evaluate() on its second call)
+    __repr__: displays the expression
+    evaluate: calls the function (or evaluates the postfix form if it
+              is not lowered yet or could not be lowered)
+    evaluate_batch: evaluates the folded postfix form over columns of
+                    values
+
+calculate_many: evaluates a stream of expressions in chunks on a process
+                pool, yielding the results in input order
+main: command line entry point for calculate_many, e.g.
+      python calculator.py expressions.txt --workers 8
+"""
+
+import argparse
+import decimal
+import fractions
+import functools
+import itertools
+import math
+import operator
+import re
+import sys
+import threading
+from collections import OrderedDict
+
+from pipeline import pipeline
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# number of factorials remembered by factorial(), and the largest operand
+# whose factorial is remembered (bigger ones are recomputed every time)
+FACTORIAL_CACHE = 512
+FACTORIAL_MEMO = 1000
+# largest n whose factorial fits in a float
+FLOAT_FACTORIAL = 170
+# longest postfix expression (in tokens) lowered to a Python function;
+# Python's compiler recurses once per nested operator
+LOWER_LIMIT = 1000
+
+
+@functools.lru_cache(maxsize=FACTORIAL_CACHE)
+def _factorial(n):
+    """returns n! for a non-negative int n (memoized)"""
+    return math.factorial(n)
+
+
+def factorial(x):
+    """returns x! for any whole number x: exact, in the same type, for a
+    Decimal or Fraction; a float otherwise (inf above 170!). Recently used
+    factorials of operands up to FACTORIAL_MEMO are remembered"""
+    n = int(x)
+    if n != x or n < 0:
+        raise ValueError('factorial is only defined for non-negative '
+                         'whole numbers')
+    if isinstance(x, (decimal.Decimal, fractions.Fraction)):
+        if n > FACTORIAL_MEMO:
+            return type(x)(math.factorial(n))
+        return type(x)(_factorial(n))
+    if n > FLOAT_FACTORIAL:
+        return math.inf
+    return float(_factorial(n))
+
+
+class Stack:
+    """list that follows the LIFO principle; for use in Calculator methods"""
+
+    def __init__(self):
+        """initializes the stack"""
+        self.elements = []
+
+    def __str__(self):
+        """displays the stack"""
+        return str(self.elements)
+
+    def isEmpty(self):
+        """determines if a stack is empty"""
+        if self.elements == []:
+            return True
+        else:
+            return False
+
+    def push(self, element):
+        """adds an element to the stack"""
+        self.elements.append(element)
+
+    def peek(self):
+        """looks at the element on top of the stack (without removing it)"""
+        return self.elements[-1]
+
+    def pop(self):
+        """removes the element from the top of the stack"""
+        return self.elements.pop()
+
+    def size(self):
+        """determines the number of elements in the stack"""
+        return len(self.elements)
+
+
+class CalcError:
+    """error found in an expression; compares equal to its message so it
+    can be checked like the error strings returned before"""
+
+    def __init__(self, message, position=None):
+        """stores the message and the position in the expression"""
+        self.message = message
+        self.position = position
+
+    def __str__(self):
+        """displays the message"""
+        return self.message
+
+    def __repr__(self):
+        """displays the message and position"""
+        return 'CalcError({0!r}, {1!r})'.format(self.message, self.position)
+
+    def __eq__(self, other):
+        """compares the message with a string or another error"""
+        if isinstance(other, CalcError):
+            return (self.message, self.position) == (other.message,
+                                                     other.position)
+        return self.message == other
+
+    def __hash__(self):
+        """hashes the message"""
+        return hash(self.message)
+
+
+class ExpressionCache:
+    """least-recently-used cache of parsed expressions, keyed by the
+    expression string; safe to share between threads"""
+
+    def __init__(self, maxsize=4096):
+        """initializes an empty cache holding up to maxsize entries"""
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        """returns the number of cached entries"""
+        return len(self.entries)
+
+    def get(self, key):
+        """returns the entry for key and marks it as recently used; returns
+        None if key is not cached"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        """adds an entry, evicting the least recently used one when full"""
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """empties the cache and resets the statistics"""
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        """returns the hit/miss/eviction counts and the cache size"""
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'evictions': self.evictions, 'size': len(self.entries),
+                    'maxsize': self.maxsize}
+
+
+class Calculator:
+    """houses the infix to postfix conversion and evaluation"""
+
+    # cache of parsed expressions used by compile() and calculate()
+    cache = ExpressionCache()
+
+    # dictionary for the operators
+    operators = {
+        '+': (1, 1),
+        '-': (2, 1),
+        '*': (3, 1),
+        '/': (4, 1),
+        '^': (5, 1),
+        '!': (6, 1)
+    }
+    # dictionary for the parentheses
+    parens = {
+        '(': (7, 1),
+        ')': (8, 1)
+    }
+    # token for unary minus (applied to a literal it is folded into it)
+    negate = (9, 1)
+    # precedence and associativity of each operator token
+    precedence = {
+        (1, 1): (1, 'left'),
+        (2, 1): (1, 'left'),
+        (3, 1): (2, 'left'),
+        (4, 1): (2, 'left'),
+        (5, 1): (3, 'right'),
+        (9, 1): (4, 'prefix'),
+        (6, 1): (5, 'postfix')
+    }
+    # functions for the binary operators, used by evaluate_batch
+    binary = {
+        (1, 1): operator.add,
+        (2, 1): operator.sub,
+        (3, 1): operator.mul,
+        (4, 1): operator.truediv,
+        (5, 1): operator.pow
+    }
+    # functions for the unary operators, used by evaluate_batch
+    unary = {
+        (6, 1): factorial,
+        (9, 1): operator.neg
+    }
+    # numeric backends: the type every literal is converted to
+    backends = {
+        'float': float,
+        'decimal': decimal.Decimal,
+        'fraction': fractions.Fraction
+    }
+    # a number, a variable name, or any other single character
+    token = re.compile(r'\s*(?:(\d+\.?\d*|\.\d+)|([A-Za-z_][A-Za-z0-9_]*)|(\S))')
+
+    @classmethod
+    def in_to_post(cls, e, number='float'):
+        """converts infix expression to postfix expression (while tokenizing the
+        elements) in a single pass using the Shunting Yard Algorithm; literals
+        are converted with the named numeric backend. Returns a CalcError if
+        the expression is malformed"""
+        convert = cls.backends[number]
+        ops = []
+        out = []
+        # whether the next token must be an operand, and the last token
+        # ('u' for a unary minus); folded is set after a literal that took
+        # in the unary minus before it, which a following ! must undo,
+        # since ! binds tighter than the minus
+        expect = True
+        last = None
+        folded = False
+        for match in cls.token.finditer(e):
+            literal, name, char = match.groups()
+            position = match.start(match.lastindex)
+            negated, folded = folded, False
+            if literal is not None or name is not None or char == '(':
+                if not expect:
+                    return CalcError('Error: Missing Operator', position)
+                if char == '(':
+                    ops.append(cls.parens['('])
+                elif name is not None:
+                    out.append((name, 2))
+                    expect = False
+                elif last == 'u':
+                    ops.pop()
+                    out.append((-convert(literal), 0))
+                    expect = False
+                    folded = True
+                else:
+                    out.append((convert(literal), 0))
+                    expect = False
+            elif char == ')':
+                if expect:
+                    return CalcError('Error: Missing Operand', position)
+                while ops and ops[-1] != (7, 1):
+                    out.append(ops.pop())
+                if not ops:
+                    return CalcError('Error: Mismatched Parentheses', position)
+                ops.pop()
+            elif char == '-' and expect:
+                ops.append(cls.negate)
+                last = 'u'
+                continue
+            elif char in cls.operators:
+                x = cls.operators[char]
+                rank, assoc = cls.precedence[x]
+                if expect:
+                    if last in cls.operators:
+                        return CalcError('Error: Consecutive Operators',
+                                         position)
+                    return CalcError('Error: Missing Operand', position)
+                if negated and assoc == 'postfix':
+                    out[-1] = (-out[-1][0], 0)
+                    ops.append(cls.negate)
+                while ops and ops[-1] != (7, 1):
+                    top = cls.precedence[ops[-1]][0]
+                    if top > rank or (top == rank and assoc == 'left'):
+                        out.append(ops.pop())
+                    else:
+                        break
+                if assoc == 'postfix':
+                    out.append(x)
+                else:
+                    ops.append(x)
+                    expect = True
+            else:
+                return CalcError('Error: Unexpected Character', position)
+            last = char
+        if expect:
+            return CalcError('Error: Missing Operand', len(e))
+        while ops:
+            x = ops.pop()
+            if x == (7, 1):
+                return CalcError('Error: Mismatched Parentheses', len(e))
+            out.append(x)
+        return out
+
+    @classmethod
+    def evaluate(cls, out, variables=None, context=None):
+        """evaulates postfix expression, looking variables up in the
+        variables dictionary (Decimal arithmetic uses context if given)"""
+        if isinstance(out, CalcError):
+            return out
+        if context is not None:
+            with decimal.localcontext(context):
+                return cls.evaluate(out, variables)
+        numbers = Stack()
+        for i in out:
+            if i[1] == 0:
+                numbers.push((i)[0])
+            elif i[1] == 2:
+                if variables is None or i[0] not in variables:
+                    return CalcError('Error: Undefined Variable')
+                numbers.push(variables[i[0]])
+            else:
+                if i == (7, 1):
+                    return CalcError('Error: Mismatched Parentheses')
+                if i == (1, 1):
+                    value = numbers.pop() + numbers.pop()
+                    numbers.push(value)
+                elif i == (2, 1):
+                    value = -numbers.pop() + numbers.pop()
+                    numbers.push(value)
+                elif i == (3, 1):
+                    value = numbers.pop() * numbers.pop()
+                    numbers.push(value)
+                elif i == (4, 1):
+                    x = numbers.pop()
+                    y = numbers.pop()
+                    value = y / x
+                    numbers.push(value)
+                elif i == (5, 1):
+                    x = numbers.pop()
+                    y = numbers.pop()
+                    value = y ** x
+                    numbers.push(value)
+                elif i == (6, 1):
+                    value = factorial(numbers.pop())
+                    numbers.push(value)
+                elif i == (9, 1):
+                    numbers.push(-numbers.pop())
+        if numbers.size() > 1:
+            return CalcError('Input Error')
+        else:
+            return numbers.pop()
+
+    @classmethod
+    def evaluate_batch(cls, out, columns, vectorize=True):
+        """evaluates postfix expression once per row of columns, a
+        dictionary of equal-length sequences (lists, array.array or NumPy
+        arrays) holding the values of the variables; each operator is
+        applied to whole columns at once, with NumPy when it is installed
+        and vectorize is set (float arithmetic only). Returns a new list (a
+        new NumPy array with NumPy), or a CalcError if the columns are not
+        all the same length"""
+        if isinstance(out, CalcError):
+            return out
+        lengths = {len(v) for v in columns.values()}
+        if len(lengths) > 1:
+            return CalcError('Error: Unequal Column Lengths')
+        rows = lengths.pop() if lengths else 1
+        if not vectorize:
+            columns = {k: list(v) for k, v in columns.items()}
+        elif numpy is not None:
+            columns = {k: numpy.asarray(v, dtype=float)
+                       for k, v in columns.items()}
+        numbers = Stack()
+        for i in out:
+            if i[1] == 0:
+                numbers.push(i[0])
+            elif i[1] == 2:
+                if i[0] not in columns:
+                    return CalcError('Error: Undefined Variable')
+                numbers.push(columns[i[0]])
+            elif i == (7, 1):
+                return CalcError('Error: Mismatched Parentheses')
+            elif i in cls.unary:
+                numbers.push(cls.apply_batch(cls.unary[i], rows,
+                                             numbers.pop()))
+            else:
+                x = numbers.pop()
+                y = numbers.pop()
+                numbers.push(cls.apply_batch(cls.binary[i], rows, y, x))
+        if numbers.size() > 1:
+            return CalcError('Input Error')
+        value = numbers.pop()
+        if not hasattr(value, '__len__'):
+            value = [value] * rows
+        if numpy is not None and vectorize:
+            return numpy.broadcast_to(value, (rows,)).copy()
+        return list(value)
+
+    @staticmethod
+    def apply_batch(op, rows, *args):
+        """applies op elementwise to args, each a column or a single
+        number"""
+        if not any(hasattr(a, '__len__') for a in args):
+            return op(*args)
+        if numpy is not None and not any(isinstance(a, list) for a in args):
+            if op is factorial:
+                return numpy.vectorize(op, otypes=[float])(*args)
+            return op(*args)
+        return list(map(op, *[a if hasattr(a, '__len__')
+                              else itertools.repeat(a, rows)
+                              for a in args]))
+
+    @classmethod
+    def fold(cls, out):
+        """folds constant subexpressions of a postfix expression into single
+        numbers in one pass; returns the new postfix list (out itself if it
+        is malformed)"""
+        if isinstance(out, CalcError):
+            return out
+        tokens = []
+        # each operand is (start, value): where its tokens start in tokens,
+        # and its value if it is a constant (None otherwise)
+        operands = []
+        for i in out:
+            if i[1] == 0:
+                operands.append((len(tokens), i[0]))
+                tokens.append(i)
+            elif i[1] == 2:
+                operands.append((len(tokens), None))
+                tokens.append(i)
+            elif i in cls.unary and operands:
+                start, x = operands.pop()
+                if x is not None:
+                    x = cls.fold_op(tokens, start, i, cls.unary[i], x)
+                else:
+                    tokens.append(i)
+                operands.append((start, x))
+            elif i in cls.binary and len(operands) > 1:
+                x = operands.pop()[1]
+                start, y = operands.pop()
+                if x is not None and y is not None:
+                    x = cls.fold_op(tokens, start, i, cls.binary[i], y, x)
+                else:
+                    x = None
+                    tokens.append(i)
+                operands.append((start, x))
+            else:
+                return out
+        if len(operands) != 1:
+            return out
+        return tokens
+
+    @classmethod
+    def fold_op(cls, tokens, start, op, function, *args):
+        """applies function (the one op stands for) to the constant args;
+        unless it raises, replaces the operand's tokens from start on with
+        the result and returns it, otherwise appends op and returns None"""
+        try:
+            value = function(*args)
+        except (ArithmeticError, ValueError, TypeError):
+            tokens.append(op)
+            return None
+        tokens[start:] = [(value, 0)]
+        return value
+
+    @classmethod
+    def lower(cls, out):
+        """turns a postfix expression into a Python function taking one
+        argument per variable; returns the function and the variable
+        names in argument order (None and [] if it cannot be lowered, or
+        has more than LOWER_LIMIT tokens)"""
+        if isinstance(out, CalcError) or len(out) > LOWER_LIMIT:
+            return None, []
+        names = []
+        namespace = {'fact': cls.unary[(6, 1)]}
+        # each operand is (source, level); levels follow Python's
+        # precedence: 1 + -, 2 * /, 3 unary -, 4 **, 5 atoms
+        operands = []
+        levels = {(1, 1): (1, '+'), (2, 1): (1, '-'), (3, 1): (2, '*'),
+                  (4, 1): (2, '/'), (5, 1): (4, '**')}
+        for i in out:
+            if i[1] == 0:
+                name = 'k{0}'.format(len(namespace))
+                namespace[name] = i[0]
+                operands.append((name, 5))
+            elif i[1] == 2:
+                if i[0] not in names:
+                    names.append(i[0])
+                operands.append(('v{0}'.format(names.index(i[0])), 5))
+            elif i == (6, 1):
+                x = operands.pop()
+                operands.append(('fact({0})'.format(x[0]), 5))
+            elif i == (9, 1):
+                x = operands.pop()
+                source = x[0] if x[1] >= 3 else '(' + x[0] + ')'
+                operands.append(('-' + source, 3))
+            else:
+                level, symbol = levels[i]
+                right = operands.pop()
+                left = operands.pop()
+                if level == 4:
+                    # right associative, and allows a unary right operand
+                    lparen = left[1] <= 4
+                    rparen = right[1] < 3
+                else:
+                    lparen = left[1] < level
+                    rparen = right[1] <= level
+                operands.append(('{0} {1} {2}'.format(
+                    '(' + left[0] + ')' if lparen else left[0], symbol,
+                    '(' + right[0] + ')' if rparen else right[0]), level))
+        args = ', '.join('v{0}'.format(n) for n in range(len(names)))
+        try:
+            function = eval('lambda {0}: {1}'.format(args, operands[0][0]),
+                            namespace)
+        except (SyntaxError, RecursionError, MemoryError):
+            return None, []
+        return function, names
+
+    @classmethod
+    def compile(cls, e, number='float', context=None, lower=True):
+        """parses an expression once for the named numeric backend (and
+        Decimal context); returns a CompiledExpression, reusing the cached
+        one if the same expression was compiled the same way before. With
+        lower set, it is lowered to a Python function right away; otherwise
+        only once it is evaluated a second time"""
+        key = e if number == 'float' and context is None else (
+            e, number, repr(context))
+        compiled = cls.cache.get(key)
+        if compiled is None:
+            compiled = CompiledExpression(e, cls.in_to_post(e, number), cls,
+                                          number, context, lower=False)
+            cls.cache.put(key, compiled)
+        if lower:
+            compiled.lower()
+        return compiled
+
+    @classmethod
+    def calculate(cls, e, variables=None, number='float', context=None):
+        """wrapper for in_to_post() and evaluate() (through the cache);
+        number names the numeric backend: 'float', 'decimal' (rounded by
+        context if given) or 'fraction' (exact). An expression seen for
+        the first time is interpreted, not lowered"""
+        return cls.compile(e, number, context, False).evaluate(variables)
+
+
+class CompiledExpression:
+    """an expression parsed once, to be evaluated many times"""
+
+    def __init__(self, expr, postfix, calculator=Calculator, number='float',
+                 context=None, lower=True):
+        """stores the expression and its postfix form; with lower set,
+        folds its constants and lowers it to a Python function right away
+        (otherwise that waits for its second evaluation)"""
+        self.expr = expr
+        self.postfix = postfix
+        self.calculator = calculator
+        self.number = number
+        self.context = context
+        self.program = postfix
+        self.function = None
+        self.names = []
+        self.constant = False
+        self.lowered = False
+        self.evaluations = 0
+        if lower:
+            self.lower()
+
+    def lower(self):
+        """folds the constants of the postfix form and lowers it to a
+        Python function, once; an expression that folds to a single
+        number needs no function"""
+        if self.lowered:
+            return
+        with decimal.localcontext(self.context or decimal.getcontext()):
+            self.program = self.calculator.fold(self.postfix)
+        self.constant = (not isinstance(self.program, CalcError)
+                         and len(self.program) == 1
+                         and self.program[0][1] == 0)
+        if not self.constant:
+            self.function, self.names = self.calculator.lower(self.program)
+        self.lowered = True
+
+    def __repr__(self):
+        """displays the expression"""
+        return 'CompiledExpression({0!r})'.format(self.expr)
+
+    def evaluate(self, variables=None, **values):
+        """evaluates the postfix form; variables are given as a dictionary
+        and/or keyword arguments (and converted to the numeric backend)"""
+        if not self.lowered:
+            self.evaluations += 1
+            if self.evaluations > 1:
+                self.lower()
+        if self.constant:
+            return self.program[0][0]
+        if values:
+            variables = dict(variables or {}, **values)
+        if variables and self.number != 'float':
+            convert = self.calculator.backends[self.number]
+            variables = {k: v if isinstance(v, convert) else convert(v)
+                         for k, v in variables.items()}
+        if self.function is None:
+            return self.calculator.evaluate(self.program, variables,
+                                            self.context)
+        try:
+            args = [variables[name] for name in self.names]
+        except (KeyError, TypeError):
+            return CalcError('Error: Undefined Variable')
+        if self.context is not None:
+            with decimal.localcontext(self.context):
+                return self.function(*args)
+        return self.function(*args)
+
+    def evaluate_batch(self, columns=None, **values):
+        """evaluates the postfix form once per row of the columns given as
+        a dictionary and/or keyword arguments"""
+        columns = dict(columns or {}, **values)
+        if self.number != 'float':
+            convert = self.calculator.backends[self.number]
+            columns = {k: [convert(x) for x in v] for k, v in columns.items()}
+            if self.context is not None:
+                with decimal.localcontext(self.context):
+                    return self.calculator.evaluate_batch(self.program,
+                                                          columns, False)
+            return self.calculator.evaluate_batch(self.program, columns,
+                                                  False)
+        return self.calculator.evaluate_batch(self.program, columns)
+
+
+def _calculate_chunk(chunk, number='float'):
+    """evaluates a chunk of expressions, each distinct one only once;
+    returns (expression, result) pairs, exceptions becoming CalcError
+    results"""
+    results = {}
+    for e in chunk:
+        if e not in results:
+            try:
+                results[e] = Calculator.calculate(e, number=number)
+            except Exception as error:
+                results[e] = CalcError('Error: {0}'.format(error))
+    return [(e, results[e]) for e in chunk]
+
+
+def _chunks(expressions, chunksize):
+    """groups an iterable of expressions into lists of chunksize"""
+    iterator = iter(expressions)
+    while True:
+        chunk = list(itertools.islice(iterator, chunksize))
+        if not chunk:
+            break
+        yield chunk
+
+
+def calculate_many(expressions, workers=None, chunksize=1000,
+                   number='float'):
+    """evaluates every expression of an iterable (a file of expressions
+    works too) in chunks on a pool of worker processes with
+    pipeline.pipeline, or in this process if workers is 1; yields
+    (expression, result) pairs in input order, with errors as CalcError
+    results"""
+    chunks = _chunks((e.rstrip('\n') for e in expressions), chunksize)
+    for pairs in pipeline(functools.partial(_calculate_chunk, number=number),
+                          chunks, workers):
+        yield from pairs
+
+
+def main(argv=None):
+    """command line entry point: evaluates the expressions in a file (or
+    standard input), one per line, printing one result per line"""
+    parser = argparse.ArgumentParser(
+        description='Evaluate one expression per line.')
+    parser.add_argument('file', nargs='?', default='-',
+                        help='file of expressions (default: standard input)')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='worker processes (default: one per CPU)')
+    parser.add_argument('--chunksize', type=int, default=1000,
+                        help='expressions sent to a worker at a time')
+    parser.add_argument('--number', choices=sorted(Calculator.backends),
+                        default='float', help='numeric backend')
+    args = parser.parse_args(argv)
+    file = sys.stdin if args.file == '-' else open(args.file)
+    try:
+        for e, result in calculate_many(file, args.workers, args.chunksize,
+                                        args.number):
+            print(result)
+    finally:
+        if file is not sys.stdin:
+            file.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,199 +1,891 @@
-"""
-This program uses the bitstream class to compress files using the
-Huffman algorithm.
-
-HuffNode: represents nodes used to build the Huffman tree
-    __init__: initializes the node
-    __str__: prints the node in string form
-
-Huffman: manages reading/writing of the Huffman tree and compressing/
-         decompressing of files
-    __init__: accepts an input file name and output file name; sets up
-              internal attributes for compressing or decompressing
-    insert: accepts an ascii code; inserts the node at the proper
-            position
-    count: counts the frequency of different characters in the input
-        file
-    buildtree: constructs the code tree using the Huffman algorithm
-    putcode: accepts a character number x; puts the code for x into the
-             compressed file
-    putheader: puts the Huffman header into the compressed file
-    getheader: gets header information from the compressed file
-               and builds the Huffman tree in node_array
-    encode: encodes the file using the Huffman tree and writes
-            to the compressed file
-    decode: decodes the file using the Huffman tree and writes
-            to the decompressed file
-"""
-from bitstream import Bitstream
-
-
-class HuffNode:
-    """Represent nodes used to build the Huffman tree"""
-    def __init__(self):
-        """initialize the node"""
-        self.lchild = None
-        self.rchild = None
-        self.parent = None
-        self.weight = 0
-        self.nextroot = None
-
-    def __str__(self):
-        """Print node in string form (for debugging)"""
-        return "w:{0},l:{1},r:{2},p:{3},n:{4}".format(self.weight,
-                                                      self.lchild,
-                                                      self.rchild,
-                                                      self.parent,
-                                                      self.nextroot)
-
-
-class Huffman:
-    """Manage reading/writing of Huffman tree and
-       compressing/decompressing of files
-    """
-
-    def __init__(self, infile, outfile):
-        """Set up internal attributes for either compressing or
-           decompressing
-        """
-        # Index of final root node
-        self.root = None
-        # Head of linked list of root nodes
-        self.rootlist = None
-        # Number of leaves
-        self.leaves = 0
-        # Huffman tree array
-        self.node_array = [HuffNode() for i in range(513)]
-        # Open input and output files
-        self.infile = infile
-        self.bsIn = Bitstream(infile, "r")
-        self.bsOut = Bitstream(outfile, "w")
-
-    def insert(self, i):
-        """Given an ascii code i, insert its node at the proper
-           position (assuming ascending order)
-        """
-        if self.rootlist is None:
-            self.rootlist = i
-        elif self.node_array[self.rootlist].weight >= self.node_array[
-                i].weight:
-            temp = self.rootlist
-            self.rootlist = i
-            self.node_array[self.rootlist].nextroot = temp
-        else:
-            x = self.node_array[self.rootlist]
-            while True:
-                if x.nextroot is None:
-                    self.root = i
-                    x.nextroot = i
-                    break
-                elif self.node_array[x.nextroot].weight >= self.node_array[
-                        i].weight:
-                    temp = x.nextroot
-                    x.nextroot = i
-                    self.node_array[x.nextroot].nextroot = temp
-                    break
-                else:
-                    x = self.node_array[x.nextroot]
-
-    def count(self):
-        """Count the frequency of characters in the input file"""
-        fileIn = open(self.infile, "rb")
-        self.node_array[256].weight += 1  # eof character
-        while True:
-            try:
-                b = fileIn.read(1)
-                self.node_array[int(b[0])].weight += 1
-            except:
-                break
-        fileIn.close()
-
-    def buildtree(self):
-        """Construct code tree using the Huffman algorithm"""
-        for i in range(513):
-            if self.node_array[i].weight != 0:
-                self.insert(i)
-        i = 257
-        while self.rootlist is not None and self.node_array[
-                self.rootlist].nextroot is not None:
-            u = self.rootlist
-            v = self.node_array[self.rootlist].nextroot
-            w = self.node_array[self.rootlist].weight + self.node_array[
-                self.node_array[self.rootlist].nextroot].weight
-            self.node_array[i].weight = w
-            self.node_array[i].lchild = self.rootlist
-            self.node_array[i].rchild = self.node_array[
-                self.rootlist].nextroot
-            self.node_array[u].parent = i
-            self.node_array[v].parent = i
-            self.rootlist = self.node_array[self.node_array[self.rootlist]
-                                            .nextroot].nextroot
-            self.insert(i)
-            i += 1
-        if self.node_array[self.rootlist].nextroot is None:
-            self.root = self.rootlist
-
-    def putcode(self, x):
-        """Put code for character x into compressed file"""
-        code = []
-        while self.node_array[x].parent is not None:
-            y = self.node_array[x].parent
-            if self.node_array[y].lchild == x:
-                code.append(0)
-            if self.node_array[y].rchild == x:
-                code.append(1)
-            x = y
-        code.reverse()
-        for i in code:
-            self.bsOut.putbit(i)
-
-    def putheader(self):
-        """Put Huffman tree into compressed file"""
-        x = 257
-        self.bsOut.putint(self.root, 10)
-        while x <= self.root:
-            self.bsOut.putint(self.node_array[x].lchild, 9)
-            self.bsOut.putint(self.node_array[x].rchild, 9)
-            x += 1
-
-    def getheader(self):
-        """Get header information from huffman compressed file and
-           construct Huffman tree in node_array
-        """
-        x = 257
-        self.root = self.bsIn.getint(10)
-        while x <= self.root:
-            self.node_array[x].lchild = self.bsIn.getint(9)
-            self.node_array[x].rchild = self.bsIn.getint(9)
-            x += 1
-
-    def encode(self):
-        """Encode the file using the Huffman tree and write it to the
-           compressed file
-        """
-        while True:
-            try:
-                c = self.bsIn.getint(8)
-                self.putcode(c)
-            except:
-                break
-        self.putcode(256)
-        self.bsOut.close()
-
-    def decode(self):
-        """Decode the file using the reconstructed Huffman tree and
-           write it to the decompressed file
-        """
-        x = self.root
-        while True:
-            while x > 256:
-                y = self.bsIn.getbit()
-                if y == 0:
-                    x = self.node_array[x].lchild
-                if y == 1:
-                    x = self.node_array[x].rchild
-            self.bsOut.putint(x, 8)
-            if x == 256:
-                break
-            x = self.root
-        self.bsOut.close()
+"""
+This program uses the bitstream class to compress files using the
+Huffman algorithm.
+
+HuffNode: represents nodes used to build the Huffman tree
+    __init__: initializes the node
+    __str__: prints the node in string form
+
+Huffman: manages reading/writing of the Huffman tree and compressing/
+         decompressing of files
+    __init__: accepts an input file name and output file name, and
+              optionally the canonical flag and maximum code length;
+              sets up internal attributes for compressing or
+              decompressing
+    count: counts the frequency of different characters in the input
+        file (with numpy.bincount when NumPy is installed)
+    buildtree: constructs the code tree using the Huffman algorithm,
+               keeping the roots in a heap
+    makecodes: computes the codeword of every symbol from the tree
+    putcode: accepts a character number x; puts the code for x into the
+             compressed file
+    putchunk: accepts a chunk of bytes; puts their codes into the
+              compressed file
+    putheader: puts the Huffman header into the compressed file
+    getheader: gets header information from the compressed file
+               and builds the Huffman tree in node_array
+    encode: encodes the file using the Huffman tree and writes
+            to the compressed file
+    walk: accepts a node, a group of bits and a bit count; follows the
+          bits down the tree from the node, collecting decoded symbols
+    decodetable: accepts a node; builds the byte-at-a-time decoding
+                 table for that node
+    decode: decodes the file a byte at a time using the decoding tables
+            and writes to the decompressed file
+    decodecanonical: decodes a canonical-format file with a lookup
+                     table of code lengths
+    decodebits: decodes the file one bit at a time by walking the
+                Huffman tree (the reference decoder; old format only)
+
+Canonical Huffman format: instead of the tree, the header holds only the
+code length of every symbol (limited to maxbits bits). It starts with a
+10-bit magic value that can never be the root index of an old-format
+header, followed by an 8-bit version, so both formats can be decoded.
+
+Functions:
+    limitlengths: accepts code lengths and a maximum length; lengthens
+                  codes until none is longer than the maximum
+    canonicalcodes: accepts code lengths; returns the canonical codewords
+    putlengths: accepts a bitstream and code lengths; writes the lengths
+                in whichever of the dense or sparse layouts is shorter
+    getlengths: accepts a bitstream; reads code lengths written by
+                putlengths
+    lengthtable: accepts code lengths; builds the lookup table used to
+                 decode canonical codes
+    canonicaldecode: decodes canonical codes from a block of bytes with
+                     a lookup table
+    compressbytes: accepts a bytes-like object; returns it compressed
+    decompressbytes: accepts compressed bytes; returns them decompressed
+
+AdaptiveHuffman: compresses/decompresses in one pass without a header,
+                 updating the tree after every symbol (algorithm FGK)
+    __init__: accepts optional input and output file names; sets up a
+              tree holding only the not-yet-transmitted (NYT) leaf
+    swap: accepts two node numbers; swaps the subtrees at those nodes
+    update: accepts a symbol; adds one to its weight, restoring the
+            sibling property on the way up to the root
+    putcode: accepts a symbol; puts its current code into the compressed
+             file and updates the tree
+    feed: accepts a chunk of compressed bytes; decodes as many symbols
+          as it can, updating the tree after each one
+    encode: encodes the whole input file in one pass
+    decode: decodes the whole input file in one pass
+
+HuffmanCompressor: compresses a stream incrementally in one pass, using a
+                   given frequency table, one sampled from the start of
+                   the stream, or an adaptive tree
+    __init__: accepts an optional frequency table, sample size, maximum
+              code length and adaptive flag
+    start: accepts a frequency table; writes the header
+    compress: accepts a chunk of data; returns the compressed bytes
+              that are ready
+    flush: ends the stream and returns the remaining compressed bytes
+
+HuffmanDecompressor: decompresses a canonical-format or adaptive stream
+                     incrementally
+    __init__: accepts the adaptive flag; sets up an empty decompressor
+    decompress: accepts a chunk of compressed data; returns the
+                decompressed bytes that are ready
+    flush: returns any bytes left at the end of a truncated stream
+"""
+import heapq
+import io
+import os
+from collections import Counter
+
+from bitstream import Bitstream
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Number of bytes read or written per chunk
+CHUNKSIZE = 1 << 16
+# First 10 bits of a canonical header (old headers start with a root index
+# between 256 and 512) and the canonical format version
+MAGIC = 0x3ff
+VERSION = 1
+# Default and largest code length of the canonical format
+MAXBITS = 15
+
+
+def limitlengths(lengths, maxbits):
+    """Return a copy of lengths (indexed by symbol, 0 for unused symbols)
+       in which no code is longer than maxbits; the longest codes that
+       are still short enough are lengthened until the codes fit again
+    """
+    if max(lengths) <= maxbits:
+        return list(lengths)
+    lengths = [min(n, maxbits) for n in lengths]
+    # Kraft sum overflow, in units of 2 ** -maxbits
+    over = sum(1 << (maxbits - n) for n in lengths if n) - (1 << maxbits)
+    while over > 0:
+        x = max((n, -i) for i, n in enumerate(lengths) if 0 < n < maxbits)
+        x = -x[1]
+        lengths[x] += 1
+        over -= 1 << (maxbits - lengths[x])
+    return lengths
+
+
+def canonicalcodes(lengths):
+    """Return the canonical (value, length) codeword of every symbol with
+       a nonzero length (None for the others); bit 0 of value is the
+       first bit written
+    """
+    codes = [None] * len(lengths)
+    code = 0
+    last = 0
+    for n, x in sorted((n, x) for x, n in enumerate(lengths) if n):
+        code <<= n - last
+        last = n
+        codes[x] = (int(format(code, '0{0}b'.format(n))[::-1], 2), n)
+        code += 1
+    return codes
+
+
+def putlengths(bs, lengths):
+    """Write the 257 code lengths to bitstream bs: a 0 bit followed by 4
+       bits per symbol, or a 1 bit, a 9-bit count and a 9-bit symbol and
+       4-bit length for every used symbol
+    """
+    used = [x for x in range(257) if lengths[x]]
+    if 9 + 13 * len(used) < 4 * 257:
+        bs.putint(1, 1)
+        bs.putint(len(used), 9)
+        for x in used:
+            bs.putint(x, 9)
+            bs.putint(lengths[x], 4)
+    else:
+        bs.putint(0, 1)
+        for x in range(257):
+            bs.putint(lengths[x], 4)
+
+
+def getlengths(bs):
+    """Read the 257 code lengths written by putlengths from bitstream bs;
+       return None if the bitstream ends first
+    """
+    sparse = bs.getint(1)
+    if sparse == 1:
+        lengths = [0] * 257
+        used = bs.getint(9)
+        for i in range(used or 0):
+            x = bs.getint(9)
+            n = bs.getint(4)
+            if n is None:
+                return None
+            lengths[x] = n
+        return lengths if used is not None else None
+    lengths = [bs.getint(4) for x in range(257)]
+    return None if None in lengths else lengths
+
+
+def lengthtable(lengths):
+    """Return the decoding table for canonical codes with these lengths
+       and its width in bits: entry b holds the (symbol, length) of the
+       codeword the low bits of b start with (None if no codeword does)
+    """
+    width = max(lengths)
+    table = [None] * (1 << width)
+    for x, code in enumerate(canonicalcodes(lengths)):
+        if code is not None:
+            for b in range(code[0], 1 << width, 1 << code[1]):
+                table[b] = (x, code[1])
+    return table, width
+
+
+def canonicaldecode(table, width, acc, nbits, data, final):
+    """Decode canonical codes from the bytes in data, following nbits
+       leftover bits in acc; return the decoded bytes, the new leftover
+       bits and their count, whether the end-of-file code was read and
+       how many bytes of data were used. Without final, codes that may
+       continue past data are left over.
+    """
+    out = bytearray()
+    mask = (1 << width) - 1
+    used = 0
+    while True:
+        if nbits < width and used < len(data):
+            piece = data[used:used + 8]
+            used += len(piece)
+            acc |= int.from_bytes(piece, 'little') << nbits
+            nbits += len(piece) << 3
+        if nbits < width and not (final and nbits > 0 and used == len(data)):
+            break
+        entry = table[acc & mask]
+        if entry is None or entry[1] > nbits:
+            if nbits >= width:
+                raise ValueError("invalid Huffman code")
+            break
+        acc >>= entry[1]
+        nbits -= entry[1]
+        if entry[0] == 256:
+            return bytes(out), acc, nbits, True, used
+        out.append(entry[0])
+    return bytes(out), acc, nbits, False, used
+
+
+class HuffNode:
+    """Represent nodes used to build the Huffman tree"""
+    def __init__(self):
+        """initialize the node"""
+        self.lchild = None
+        self.rchild = None
+        self.parent = None
+        self.weight = 0
+
+    def __str__(self):
+        """Print node in string form (for debugging)"""
+        return "w:{0},l:{1},r:{2},p:{3}".format(self.weight,
+                                                self.lchild,
+                                                self.rchild,
+                                                self.parent)
+
+
+class Huffman:
+    """Manage reading/writing of Huffman tree and
+       compressing/decompressing of files
+    """
+
+    def __init__(self, infile, outfile, canonical=False, maxbits=MAXBITS):
+        """Set up internal attributes for either compressing or
+           decompressing; with canonical set, compress to the canonical
+           format with codes of at most maxbits bits
+        """
+        if not 9 <= maxbits <= MAXBITS:
+            raise ValueError("maxbits must be between 9 and 15")
+        # Header format and code length limit
+        self.canonical = canonical
+        self.maxbits = maxbits
+        # Code length of each symbol (canonical format only)
+        self.lengths = None
+        # Codeword of each symbol, as (value, length) and as bit strings
+        self.codes = None
+        self.strings = None
+        # Index of final root node
+        self.root = None
+        # Number of leaves
+        self.leaves = 0
+        # Huffman tree array
+        self.node_array = [HuffNode() for i in range(513)]
+        # Open input and output files
+        self.infile = infile
+        self.bsIn = Bitstream(infile, "r")
+        self.bsOut = Bitstream(outfile, "w")
+
+    def count(self):
+        """Count the frequency of characters in the input file, a chunk
+           at a time; a file-like input is read from its current position
+           and then rewound, so encode still sees all of it
+        """
+        start = None
+        if not isinstance(self.infile, (str, os.PathLike, bytes, bytearray,
+                                        memoryview)):
+            if not self.infile.seekable():
+                raise ValueError("cannot count an unseekable stream twice; "
+                                 "pass the data as bytes instead")
+            start = self.infile.tell()
+        counts = [0] * 256
+        bs = Bitstream(self.infile, "r")
+        while True:
+            chunk = bs.getbytes(CHUNKSIZE)
+            if len(chunk) == 0:
+                break
+            if numpy is not None:
+                counts = numpy.bincount(numpy.frombuffer(chunk, numpy.uint8),
+                                        minlength=256) + counts
+            else:
+                for c, n in Counter(chunk).items():
+                    counts[c] += n
+        bs.close()
+        if start is not None:
+            self.infile.seek(start)
+        for c in range(256):
+            self.node_array[c].weight += int(counts[c])
+        self.node_array[256].weight += 1  # eof character
+
+    def buildtree(self):
+        """Construct code tree using the Huffman algorithm; the roots are
+           kept in a heap ordered by weight, and among equal weights the
+           most recently added root comes first
+        """
+        heap = []
+        order = 0
+        for i in range(513):
+            if self.node_array[i].weight != 0:
+                order -= 1
+                heap.append((self.node_array[i].weight, order, i))
+        heapq.heapify(heap)
+        i = 257
+        while len(heap) > 1:
+            u = heapq.heappop(heap)[2]
+            v = heapq.heappop(heap)[2]
+            self.node_array[i].weight = self.node_array[u].weight + \
+                self.node_array[v].weight
+            self.node_array[i].lchild = u
+            self.node_array[i].rchild = v
+            self.node_array[u].parent = i
+            self.node_array[v].parent = i
+            order -= 1
+            heapq.heappush(heap, (self.node_array[i].weight, order, i))
+            i += 1
+        if heap:
+            self.root = heap[0][2]
+        self.makecodes()
+
+    def makecodes(self):
+        """Compute the codeword of every symbol in the tree as a (value,
+           length) pair; bit 0 of value is the first bit written
+        """
+        self.strings = None
+        self.codes = [None] * 257
+        for leaf in range(257):
+            if leaf != self.root and self.node_array[leaf].parent is None:
+                continue
+            value = 0
+            length = 0
+            x = leaf
+            while self.node_array[x].parent is not None:
+                y = self.node_array[x].parent
+                value <<= 1
+                if self.node_array[y].rchild == x:
+                    value |= 1
+                length += 1
+                x = y
+            self.codes[leaf] = (value, length)
+        if self.canonical:
+            lengths = [0 if code is None else code[1] for code in self.codes]
+            if max(lengths) == 0:
+                # a lone end-of-file code still needs one bit
+                lengths[256] = 1
+            self.lengths = limitlengths(lengths, self.maxbits)
+            self.codes = canonicalcodes(self.lengths)
+
+    def putcode(self, x):
+        """Put code for character x into compressed file"""
+        self.bsOut.putbits(*self.codes[x])
+
+    def putheader(self):
+        """Put Huffman tree (or, for the canonical format, the code
+           lengths) into compressed file
+        """
+        if self.canonical:
+            self.bsOut.putint(MAGIC, 10)
+            self.bsOut.putint(VERSION, 8)
+            putlengths(self.bsOut, self.lengths)
+            return
+        x = 257
+        self.bsOut.putint(self.root, 10)
+        while x <= self.root:
+            self.bsOut.putint(self.node_array[x].lchild, 9)
+            self.bsOut.putint(self.node_array[x].rchild, 9)
+            x += 1
+
+    def getheader(self):
+        """Get header information from huffman compressed file and
+           construct Huffman tree in node_array (or, for the canonical
+           format, the code lengths)
+        """
+        x = 257
+        self.root = self.bsIn.getint(10)
+        if self.root == MAGIC:
+            version = self.bsIn.getint(8)
+            if version != VERSION:
+                raise ValueError("unknown Huffman format version {0}"
+                                 .format(version))
+            self.canonical = True
+            self.root = None
+            self.lengths = getlengths(self.bsIn)
+            if self.lengths is None:
+                raise ValueError("truncated Huffman header")
+            return
+        while x <= self.root:
+            self.node_array[x].lchild = self.bsIn.getint(9)
+            self.node_array[x].rchild = self.bsIn.getint(9)
+            x += 1
+
+    def putchunk(self, chunk):
+        """Put the codes for every byte of chunk into the compressed file
+           with a single putbits call
+        """
+        if self.strings is None:
+            # codewords as bit strings, last bit written first, so that
+            # the strings of a reversed chunk join into its bits as one
+            # integer
+            self.strings = [None] * 257
+            for x, code in enumerate(self.codes):
+                if code is not None:
+                    self.strings[x] = format(code[0], '0{0}b'.format(
+                        code[1])) if code[1] else ''
+        bits = ''.join(map(self.strings.__getitem__, chunk[::-1]))
+        if bits:
+            self.bsOut.putbits(int(bits, 2), len(bits))
+
+    def encode(self):
+        """Encode the file using the Huffman tree and write it to the
+           compressed file, reading the input a chunk at a time
+        """
+        while True:
+            chunk = self.bsIn.getbytes(CHUNKSIZE)
+            if len(chunk) == 0:
+                break
+            self.putchunk(chunk)
+        self.putcode(256)
+        self.bsOut.close()
+
+    def walk(self, x, bits, numbits):
+        """Follow numbits bits (least significant first) down the tree
+           from node x; return the decoded bytes, the node reached and
+           whether the end-of-file code was read
+        """
+        out = bytearray()
+        for i in range(numbits):
+            if (bits >> i) & 1:
+                x = self.node_array[x].rchild
+            else:
+                x = self.node_array[x].lchild
+            if x <= 256:
+                if x == 256:
+                    return bytes(out), x, True
+                out.append(x)
+                x = self.root
+        return bytes(out), x, False
+
+    def decodetable(self, x):
+        """Build the decoding table for node x: entry b holds what walk
+           returns for the 8 bits of input byte b
+        """
+        return [self.walk(x, b, 8) for b in range(256)]
+
+    def decode(self):
+        """Decode the file using the reconstructed Huffman tree and
+           write it to the decompressed file; each input byte is decoded
+           with one lookup in the table of the node the previous byte
+           ended on (tables are built the first time a node is reached)
+        """
+        if self.canonical:
+            self.decodecanonical()
+            return
+        tables = [None] * 513
+        if self.root <= 256:
+            # the end-of-file code is the only code and has no bits
+            done = True
+        else:
+            # decode up to the byte boundary the header ended in
+            lead = self.bsIn.nbits & 7
+            out, x, done = self.walk(self.root, self.bsIn.getbits(lead),
+                                     lead)
+            self.bsOut.putbytes(out)
+        while not done:
+            chunk = self.bsIn.getbytes(CHUNKSIZE)
+            if len(chunk) == 0:
+                break
+            parts = []
+            for b in chunk:
+                table = tables[x]
+                if table is None:
+                    table = tables[x] = self.decodetable(x)
+                out, x, done = table[b]
+                parts.append(out)
+                if done:
+                    break
+            self.bsOut.putbytes(b''.join(parts))
+        # the end-of-file code has always been written out as a zero byte
+        self.bsOut.putint(256, 8)
+        self.bsOut.close()
+
+    def decodecanonical(self):
+        """Decode a canonical-format file using a lookup table indexed by
+           the next maxbits bits and write it to the decompressed file
+        """
+        table, width = lengthtable(self.lengths)
+        lead = self.bsIn.nbits & 7
+        acc = self.bsIn.getbits(lead)
+        nbits = lead
+        done = False
+        while not done:
+            chunk = self.bsIn.getbytes(CHUNKSIZE)
+            out, acc, nbits, done, used = canonicaldecode(
+                table, width, acc, nbits, chunk, len(chunk) == 0)
+            self.bsOut.putbytes(out)
+            if len(chunk) == 0:
+                break
+        # the end-of-file code has always been written out as a zero byte
+        self.bsOut.putint(256, 8)
+        self.bsOut.close()
+
+    def decodebits(self):
+        """Decode the file using the reconstructed Huffman tree one bit
+           at a time and write it to the decompressed file
+        """
+        x = self.root
+        while True:
+            while x > 256:
+                y = self.bsIn.getbit()
+                if y == 0:
+                    x = self.node_array[x].lchild
+                if y == 1:
+                    x = self.node_array[x].rchild
+            self.bsOut.putint(x, 8)
+            if x == 256:
+                break
+            x = self.root
+        self.bsOut.close()
+
+
+def compressbytes(data, canonical=True, maxbits=MAXBITS):
+    """Compress the bytes-like object data in memory and return the
+       compressed bytes (canonical format unless canonical is False)
+    """
+    out = io.BytesIO()
+    h = Huffman(data, out, canonical, maxbits)
+    h.count()
+    h.buildtree()
+    h.putheader()
+    h.encode()
+    h.bsIn.close()
+    return out.getvalue()
+
+
+def decompressbytes(data):
+    """Decompress the bytes-like object data in memory and return the
+       original bytes
+    """
+    out = io.BytesIO()
+    h = Huffman(data, out)
+    h.getheader()
+    h.decode()
+    h.bsIn.close()
+    # drop the zero byte decode writes for the end-of-file code
+    return out.getvalue()[:-1]
+
+
+class AdaptiveHuffman:
+    """Compress/decompress files in one pass with an adaptive Huffman
+       tree; no header is written, the decoder rebuilds the same tree
+       from the symbols it has decoded
+    """
+
+    def __init__(self, infile=None, outfile=None):
+        """Set up a tree with only the NYT leaf and open whichever files
+           are given
+        """
+        # Huffman tree array, numbered so that weights never decrease
+        # with the node number and siblings are next to each other
+        # (257 symbols and the NYT leaf make at most 515 nodes)
+        self.node_array = [HuffNode() for i in range(515)]
+        # Symbol of each leaf, and the leaf of each symbol seen so far
+        self.symbol = [None] * 515
+        self.leaf = [None] * 257
+        self.root = 514
+        self.nyt = 514
+        # Decoding state: the node reached so far, and the bits of a
+        # symbol sent after the NYT code (count is -1 outside one)
+        self.x = self.root
+        self.value = 0
+        self.count = 0
+        self.done = False
+        self.bsIn = Bitstream(infile, "r") if infile is not None else None
+        self.bsOut = Bitstream(outfile, "w") if outfile is not None else None
+
+    def swap(self, a, b):
+        """Swap the subtrees at nodes a and b (neither is an ancestor of
+           the other); the nodes keep their places under their parents
+        """
+        u = self.node_array[a]
+        v = self.node_array[b]
+        u.weight, v.weight = v.weight, u.weight
+        u.lchild, v.lchild = v.lchild, u.lchild
+        u.rchild, v.rchild = v.rchild, u.rchild
+        self.symbol[a], self.symbol[b] = self.symbol[b], self.symbol[a]
+        for x in (a, b):
+            if self.node_array[x].lchild is not None:
+                self.node_array[self.node_array[x].lchild].parent = x
+                self.node_array[self.node_array[x].rchild].parent = x
+            if self.symbol[x] is not None:
+                self.leaf[self.symbol[x]] = x
+
+    def update(self, c):
+        """Add one to the weight of symbol c, giving it a leaf split off
+           the NYT leaf if it is new"""
+        n = self.node_array
+        if self.leaf[c] is None:
+            z = self.nyt
+            n[z].lchild = z - 2
+            n[z].rchild = z - 1
+            n[z - 2].parent = z
+            n[z - 1].parent = z
+            self.symbol[z - 1] = c
+            self.leaf[c] = z - 1
+            self.nyt = z - 2
+        q = self.leaf[c]
+        while q is not None:
+            # move q past the other nodes of its weight (but not its
+            # parent) before adding one to it
+            leader = q
+            while leader < self.root and n[leader + 1].weight == n[q].weight:
+                leader += 1
+            if leader != q and leader != n[q].parent:
+                self.swap(q, leader)
+                q = leader
+            n[q].weight += 1
+            q = n[q].parent
+
+    def putcode(self, c):
+        """Put the current code for symbol c into the compressed file (the
+           NYT code and 9 bits for a new symbol) and update the tree
+        """
+        x = self.leaf[c]
+        if x is None:
+            x = self.nyt
+        value = 0
+        length = 0
+        while self.node_array[x].parent is not None:
+            y = self.node_array[x].parent
+            value <<= 1
+            if self.node_array[y].rchild == x:
+                value |= 1
+            length += 1
+            x = y
+        self.bsOut.putbits(value, length)
+        if self.leaf[c] is None:
+            self.bsOut.putbits(c, 9)
+        self.update(c)
+
+    def feed(self, data):
+        """Decode the symbols in the bytes of data, carrying on from the
+           previous call; return the decoded bytes and how many bytes of
+           data were used (all of them unless the end-of-file code was
+           read, after which done is set)
+        """
+        n = self.node_array
+        out = bytearray()
+        used = 0
+        for byte in data:
+            if self.done:
+                break
+            used += 1
+            bits = byte | 0x100
+            while bits != 1:
+                if self.count >= 0:
+                    self.value |= (bits & 1) << self.count
+                    self.count += 1
+                    if self.count < 9:
+                        bits >>= 1
+                        continue
+                    c = self.value
+                else:
+                    if bits & 1:
+                        self.x = n[self.x].rchild
+                    else:
+                        self.x = n[self.x].lchild
+                    if self.x == self.nyt:
+                        self.value = 0
+                        self.count = 0
+                        bits >>= 1
+                        continue
+                    c = self.symbol[self.x]
+                    if c is None:
+                        bits >>= 1
+                        continue
+                bits >>= 1
+                self.count = -1
+                if c == 256:
+                    self.done = True
+                    break
+                out.append(c)
+                self.update(c)
+                self.x = self.root
+                if self.x == self.nyt:
+                    self.value = 0
+                    self.count = 0
+        return bytes(out), used
+
+    def encode(self):
+        """Encode the input file in one pass and write it to the
+           compressed file
+        """
+        while True:
+            chunk = self.bsIn.getbytes(CHUNKSIZE)
+            if len(chunk) == 0:
+                break
+            for c in chunk:
+                self.putcode(c)
+        self.putcode(256)
+        self.bsOut.close()
+
+    def decode(self):
+        """Decode the input file in one pass and write it to the
+           decompressed file
+        """
+        while not self.done:
+            chunk = self.bsIn.getbytes(CHUNKSIZE)
+            if len(chunk) == 0:
+                break
+            self.bsOut.putbytes(self.feed(chunk)[0])
+        self.bsOut.close()
+
+
+class HuffmanCompressor:
+    """Compress a stream a chunk at a time, like zlib.compressobj; the
+       output is in the canonical format (or the headerless adaptive one)
+    """
+
+    def __init__(self, freqs=None, samplesize=CHUNKSIZE, maxbits=MAXBITS,
+                 adaptive=False):
+        """Set up the compressor; freqs is a sequence of 256 byte counts
+           or a dict of them, and without it the table is sampled from
+           the first samplesize bytes of the stream. With adaptive set,
+           the stream is coded with AdaptiveHuffman instead (no header
+           and no table).
+        """
+        self.samplesize = samplesize
+        self.maxbits = maxbits
+        self.sink = io.BytesIO()
+        self.model = None
+        self.sample = bytearray()
+        self.finished = False
+        self.adaptive = adaptive
+        if adaptive:
+            self.model = AdaptiveHuffman()
+            self.model.bsOut = Bitstream(self.sink, "w", bufsize=1)
+        elif freqs is not None:
+            self.start(freqs)
+
+    def start(self, freqs):
+        """Build the codes from the byte counts in freqs and write the
+           header; every byte gets a code, even one not in freqs
+        """
+        if isinstance(freqs, dict):
+            freqs = [freqs.get(c, 0) for c in range(256)]
+        self.model = Huffman(b'', self.sink, True, self.maxbits)
+        # pass complete bytes on to the sink as soon as they are written
+        self.model.bsOut = Bitstream(self.sink, "w", bufsize=1)
+        for c in range(256):
+            self.model.node_array[c].weight = max(1, freqs[c])
+        self.model.node_array[256].weight = 1
+        self.model.buildtree()
+        self.model.putheader()
+
+    def drain(self):
+        """Return and forget the compressed bytes written so far"""
+        data = self.sink.getvalue()
+        self.sink.seek(0)
+        self.sink.truncate()
+        return data
+
+    def compress(self, data):
+        """Compress the bytes-like object data; return the compressed
+           bytes that are complete so far
+        """
+        if self.finished:
+            raise ValueError("compressor already flushed")
+        if self.model is None:
+            self.sample += data
+            if len(self.sample) < self.samplesize:
+                return b''
+            self.start(Counter(self.sample))
+            data = self.sample
+            self.sample = None
+        if self.adaptive:
+            for c in data:
+                self.model.putcode(c)
+        else:
+            self.model.putchunk(data)
+        return self.drain()
+
+    def flush(self):
+        """End the stream; return the rest of the compressed bytes"""
+        if self.finished:
+            return b''
+        if self.model is None:
+            self.start(Counter(self.sample))
+            self.model.putchunk(self.sample)
+            self.sample = None
+        self.model.putcode(256)
+        self.model.bsOut.flush()
+        self.finished = True
+        return self.drain()
+
+
+class HuffmanDecompressor:
+    """Decompress a canonical-format or adaptive stream a chunk at a
+       time, like zlib.decompressobj
+    """
+
+    def __init__(self, adaptive=False):
+        """Set up the decompressor (for a stream written by an adaptive
+           compressor if adaptive is set)
+        """
+        self.model = AdaptiveHuffman() if adaptive else None
+        # Input held back until the header is complete
+        self.pending = bytearray()
+        self.table = None
+        self.width = 0
+        # Leftover bits of the last chunk, least significant bit first
+        self.acc = 0
+        self.nbits = 0
+        # Set once the end-of-file code is read; input after it is kept
+        # in unused_data
+        self.eof = False
+        self.unused_data = b''
+
+    def readheader(self):
+        """Parse the header from the pending input; return the input
+           after it, or None if the header is not complete yet
+        """
+        bs = Bitstream(bytes(self.pending), "r")
+        magic = bs.getint(10)
+        if magic is not None and magic != MAGIC:
+            raise ValueError("not a canonical Huffman stream")
+        version = bs.getint(8)
+        if version is None:
+            return None
+        if version != VERSION:
+            raise ValueError("unknown Huffman format version {0}"
+                             .format(version))
+        lengths = getlengths(bs)
+        if lengths is None:
+            return None
+        self.table, self.width = lengthtable(lengths)
+        lead = bs.nbits & 7
+        self.acc = bs.getbits(lead)
+        self.nbits = lead
+        self.pending = None
+        return bs.getbytes(len(bs.buffer))
+
+    def decompress(self, data):
+        """Decompress the bytes-like object data; return the bytes
+           decoded so far
+        """
+        if self.eof:
+            self.unused_data += bytes(data)
+            return b''
+        if self.model is not None:
+            out, used = self.model.feed(data)
+            if self.model.done:
+                self.eof = True
+                self.unused_data = bytes(data[used:])
+            return out
+        if self.table is None:
+            self.pending += data
+            data = self.readheader()
+            if data is None:
+                return b''
+        out, self.acc, self.nbits, self.eof, used = canonicaldecode(
+            self.table, self.width, self.acc, self.nbits, data, False)
+        if self.eof:
+            # the padding of the last byte is dropped
+            self.unused_data = (self.acc >> (self.nbits & 7)).to_bytes(
+                self.nbits >> 3, 'little') + bytes(data[used:])
+        return out
+
+    def flush(self):
+        """Return the bytes still held back at the end of the input"""
+        if self.eof or self.table is None:
+            # (an adaptive decompressor never holds bytes back)
+            return b''
+        out, self.acc, self.nbits, self.eof, used = canonicaldecode(
+            self.table, self.width, self.acc, self.nbits, b'', True)
+        return out
@@ -0,0 +1,36 @@
+"""Runs a function over a stream of items on a pool of worker processes
+
+Functions:
+    pipeline: applies a function to a stream of items on a process pool,
+              yielding the results in order with a bounded number of
+              items in flight
+"""
+import collections
+import concurrent.futures
+import os
+
+
+def pipeline(func, items, workers=None, initializer=None, initargs=()):
+    """Yield func(item) for every item, in order; the calls run on a pool
+       of worker processes (in this process if workers is 1), with at most
+       two items per worker waiting at any time, so memory stays bounded
+       for any number of items. initializer(*initargs) is called once in
+       each worker process (or once here if workers is 1)
+    """
+    if workers == 1:
+        if initializer is not None:
+            initializer(*initargs)
+        for item in items:
+            yield func(item)
+        return
+    workers = workers or os.cpu_count() or 1
+    with concurrent.futures.ProcessPoolExecutor(
+            workers, initializer=initializer, initargs=initargs) as pool:
+        window = 2 * workers
+        pending = collections.deque()
+        for item in items:
+            pending.append(pool.submit(func, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -1,98 +1,478 @@
-"""This is a Quicksort / Insertion Sort hybrid
-
-Call it by passing a list and partition limit to quick_insertion
-
-Quicksort does the initial sorting; the partition limit specifies the
-length at which insertion sort takes over on the segmented lists
-
-Functions:
-    quick_insertion: calls quicksort
-    quicksort: recursively calls itself for lists segmented at the splitpoint
-    partition: finds the pivot value, compares left/right marks, swaps values
-    insertionsort: sorts the list, one value at a time
-"""
-
-
-def quick_insertion(alist, limit):
-    """calls quicksort"""
-    quicksort(alist, 0, len(alist) - 1, limit)
-    return alist
-
-
-def quicksort(alist, first, last, limit):
-    """recursively calls itself for lists segmented at the splitpoint"""
-    on = True
-
-    if on:
-        splitpoint = partition(alist, first, last, limit)
-
-    if first + limit < last:
-        quicksort(alist, first, splitpoint - 1, limit)
-        quicksort(alist, splitpoint + 1, last, limit)
-
-        if first + limit == last:
-            on = False
-    else:
-        insertion_sort(alist, first, splitpoint)
-        insertion_sort(alist, splitpoint, last)
-
-
-def partition(alist, first, last, limit):
-    """uses a median of three method to determine the pivot value; finds/compares
-    rightmark and leftmark values, swapping values when needed
-    """
-    mid = (first + last) // 2
-
-    if alist[first] <= alist[mid] and alist[first] >= alist[last]:
-        pivotvalue = alist[first]
-    elif alist[first] >= alist[mid] and alist[first] <= alist[last]:
-        pivotvalue = alist[first]
-    elif alist[mid] >= alist[first] and alist[mid] <= alist[last]:
-        pivotvalue = alist[mid]
-        alist[mid] = alist[first]
-        alist[first] = pivotvalue
-    elif alist[mid] <= alist[first] and alist[mid] >= alist[last]:
-        pivotvalue = alist[mid]
-        alist[mid] = alist[first]
-        alist[first] = pivotvalue
-    else:
-        pivotvalue = alist[last]
-        alist[last] = alist[first]
-        alist[first] = pivotvalue
-
-    leftmark = first + 1
-    rightmark = last
-    done = False
-
-    while not done:
-
-        while leftmark <= rightmark and alist[leftmark] <= pivotvalue:
-            leftmark = leftmark + 1
-
-        while alist[rightmark] >= pivotvalue and rightmark >= leftmark:
-            rightmark = rightmark - 1
-
-        if rightmark < leftmark:
-            done = True
-        else:
-            temp = alist[leftmark]
-            alist[leftmark] = alist[rightmark]
-            alist[rightmark] = temp
-
-    temp = alist[first]
-    alist[first] = alist[rightmark]
-    alist[rightmark] = temp
-    return rightmark
-
-
-def insertion_sort(alist, first, last):
-    """sorts the list one value at a time"""
-    for index in range(first, last + 1):
-        currentvalue = alist[index]
-        position = index
-
-        while position > 0 and alist[position - 1] > currentvalue:
-            alist[position] = alist[position - 1]
-            position = position - 1
-
-        alist[position] = currentvalue
+"""This is a Quicksort / Insertion Sort hybrid
+
+Call it by passing a list and partition limit to quick_insertion
+
+Quicksort does the initial sorting; the partition limit specifies the
+length at which insertion sort takes over on the segmented lists
+
+Besides lists, any mutable sequence is sorted in place: array.array and
+memoryview objects of integers spanning fewer than COUNTRANGE values are
+counting sorted, other typed arrays are sorted element by element without
+being copied to a list, and NumPy arrays use their own sort method
+
+parallel_sort splits a list into buckets by sampled splitters and sorts
+each bucket with quick_insertion on its own process; external_sort sorts
+runs of values that fit in memory, spills them to temporary files and
+merges them with a heap
+
+Pass limit='auto' to have the limit chosen for you: the first sort of
+each value type times a sample of the values at a few limits, and the
+fastest is kept for the rest of the process. To keep the limits between
+runs too, point the QUICKINSERTION_LIMITS environment variable (or
+LIMITCACHE) at a file; by default nothing is written to disk
+
+Pass key= to sort by a field: each key is computed once and sorted as a
+(key, index) pair (decorate-sort-undecorate), so comparisons are plain
+tuple comparisons and never call the values' own comparison methods
+
+The quicksort is introsort-style: segments wait on an explicit stack
+(the smaller side is always sorted first, so the stack stays O(log n)
+deep), partitioning is three-way so runs of equal values are set aside
+at once, and a segment that is split more than 2 * log2(n) times falls
+back to heapsort, so the worst case is O(n log n)
+
+Functions:
+    quick_insertion: calls quicksort; sorts by key, in reverse or stably
+    decorate: pairs each key with its index
+    undecorate: puts the values in the order of the sorted pairs
+    typecode: returns the typecode of an array.array or memoryview
+    counting_sort: sorts small-range integer arrays by counting values
+    reverse_values: reverses any mutable sequence in place
+    store: writes a list of values back into any mutable sequence
+    quicksort: sorts segments from an explicit stack, smaller side first
+    partition: finds the pivot value, splits a segment into values
+               below, equal to and above it (Dutch national flag)
+    median_of_three: returns the middle one of three values
+    heapsort: sorts a segment with a binary heap
+    sift_down: moves a value down a heap stored in a segment
+    insertion_sort: sorts a segment, one value at a time
+    calibrate: times sorting a sample at each of a few limits
+    loadlimits: reads the calibrated limits from LIMITCACHE
+    savelimits: writes the calibrated limits to LIMITCACHE
+    autolimit: returns the calibrated limit for the values of a segment
+    splitters: picks values that cut a list into buckets of similar size
+    parallel_sort: sorts the buckets on a pool of worker processes
+    spill: writes a sorted run to a temporary file
+    readrun: reads a spilled run back
+    external_sort: sorts an iterable too large for memory in runs and
+                   merges them
+"""
+
+import array
+import bisect
+import collections
+import concurrent.futures
+import heapq
+import itertools
+import json
+import math
+import os
+import pickle
+import random
+import sys
+import tempfile
+import time
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Integer typecodes of array.array and memoryview formats
+INTCODES = tuple('bBhHiIlLqQ')
+# Largest max - min of integer values that are counting sorted
+COUNTRANGE = 1 << 16
+# Number of values per spilled run in external_sort
+CHUNKSIZE = 1 << 20
+# Number of values pickled together when a run is spilled to disk
+BATCHSIZE = 4096
+# Number of sampled values per worker when choosing splitters
+OVERSAMPLE = 32
+# Partition limits tried when limit is 'auto'
+LIMITS = (4, 8, 12, 16, 24, 32, 48, 64)
+# Number of values sorted for each limit while calibrating
+CALIBRATESIZE = 4096
+# File the calibrated limits are kept in between runs (None for none)
+LIMITCACHE = os.environ.get('QUICKINSERTION_LIMITS') or None
+
+# Calibrated limits of this process, by value type
+calibrated = {}
+# Random numbers for sampling, apart from the random module's generator
+# so that sorting leaves the caller's seeded sequence alone
+_random = random.Random()
+
+
+def quick_insertion(alist, limit, key=None, reverse=False, stable=False):
+    """calls quicksort; with key, values are sorted by key(value), which is
+    computed once per value; reverse sorts from largest to smallest; stable
+    keeps values that compare equal in their original order (keyed sorts
+    are always stable)
+    """
+    if key is None and numpy is not None and isinstance(alist, numpy.ndarray):
+        alist.sort(kind='stable' if stable else 'quicksort')
+        if reverse:
+            alist[:] = alist[::-1].copy()
+        return alist
+
+    if key is None and typecode(alist) in INTCODES and counting_sort(alist):
+        if reverse:
+            reverse_values(alist)
+        return alist
+
+    if key is None and not stable:
+        quicksort(alist, 0, len(alist) - 1, limit)
+        if reverse:
+            reverse_values(alist)
+        return alist
+
+    decorated = decorate(alist, key, reverse)
+    quicksort(decorated, 0, len(decorated) - 1, limit)
+    if reverse:
+        decorated.reverse()
+    store(alist, undecorate(alist, decorated))
+    return alist
+
+
+def decorate(alist, key=None, negate=False):
+    """returns a list of (key, index) pairs for the values in alist; the
+    index breaks ties, so the values behind the keys are never compared and
+    equal keys keep their order; with negate the index is stored negated,
+    so equal keys keep their order once the sorted list is reversed
+    """
+    keys = alist if key is None else map(key, alist)
+    if negate:
+        return [(k, -i) for i, k in enumerate(keys)]
+    return [(k, i) for i, k in enumerate(keys)]
+
+
+def undecorate(alist, decorated):
+    """returns the values of alist in the order of the sorted (key, index)
+    pairs"""
+    return [alist[abs(i)] for k, i in decorated]
+
+
+def typecode(alist):
+    """returns the typecode of an array.array or the format of a flat
+    memoryview, None for anything else"""
+    if isinstance(alist, array.array):
+        return alist.typecode
+    if isinstance(alist, memoryview) and alist.ndim == 1:
+        return alist.format
+    return None
+
+
+def counting_sort(alist):
+    """sorts an array.array or memoryview of integers in place by counting
+    each value, if the values span fewer than COUNTRANGE; returns whether
+    it did"""
+    if len(alist) < 2:
+        return True
+    lo, hi = min(alist), max(alist)
+    if hi - lo >= COUNTRANGE:
+        return False
+
+    counts = collections.Counter(alist)
+    code = typecode(alist)
+    position = 0
+    for value in sorted(counts):
+        count = counts[value]
+        alist[position:position + count] = array.array(code, [value]) * count
+        position += count
+    return True
+
+
+def reverse_values(alist):
+    """reverses alist in place, also when it has no reverse method"""
+    if hasattr(alist, 'reverse'):
+        alist.reverse()
+        return
+    first, last = 0, len(alist) - 1
+    while first < last:
+        temp = alist[first]
+        alist[first] = alist[last]
+        alist[last] = temp
+        first += 1
+        last -= 1
+
+
+def store(alist, values):
+    """replaces the contents of alist with values, which has the same
+    length"""
+    if isinstance(alist, list):
+        alist[:] = values
+    else:
+        for index, value in enumerate(values):
+            alist[index] = value
+
+
+def quicksort(alist, first, last, limit):
+    """sorts alist[first:last + 1]; segments longer than limit are
+    partitioned, the rest are insertion sorted"""
+    if limit == 'auto':
+        limit = autolimit(alist, first, last)
+    limit = max(limit, 1)
+    maxdepth = 2 * int(math.log2(max(last - first + 1, 2)))
+    stack = [(first, last, 0)]
+
+    while stack:
+        first, last, depth = stack.pop()
+
+        while last - first + 1 > limit:
+            if depth > maxdepth:
+                heapsort(alist, first, last)
+                break
+            depth += 1
+            lt, gt = partition(alist, first, last)
+
+            # push the larger side, keep sorting the smaller one
+            if lt - first < last - gt:
+                stack.append((gt + 1, last, depth))
+                last = lt - 1
+            else:
+                stack.append((first, lt - 1, depth))
+                first = gt + 1
+        else:
+            insertion_sort(alist, first, last)
+
+
+def partition(alist, first, last):
+    """uses a median of three method (a median of three medians on long
+    segments) to determine the pivot value; splits alist[first:last + 1]
+    into values below, equal to and above it, returning the first and last
+    positions of the equal values
+    """
+    mid = (first + last) // 2
+
+    if last - first < 40:
+        pivotvalue = median_of_three(alist[first], alist[mid], alist[last])
+    else:
+        # Tukey's ninther: the median of three medians of three
+        step = (last - first) // 8
+        pivotvalue = median_of_three(
+            median_of_three(alist[first], alist[first + step],
+                            alist[first + 2 * step]),
+            median_of_three(alist[mid - step], alist[mid],
+                            alist[mid + step]),
+            median_of_three(alist[last - 2 * step], alist[last - step],
+                            alist[last]))
+
+    lt = first
+    index = first
+    gt = last
+
+    while index <= gt:
+        value = alist[index]
+        if value < pivotvalue:
+            alist[index] = alist[lt]
+            alist[lt] = value
+            lt += 1
+            index += 1
+        elif pivotvalue < value:
+            # skip values already above the pivot, so sorted runs stay put
+            while gt > index and pivotvalue < alist[gt]:
+                gt -= 1
+            alist[index] = alist[gt]
+            alist[gt] = value
+            gt -= 1
+        else:
+            index += 1
+
+    return lt, gt
+
+
+def median_of_three(a, b, c):
+    """returns the middle one of three values"""
+    if a <= b <= c or c <= b <= a:
+        return b
+    if b <= a <= c or c <= a <= b:
+        return a
+    return c
+
+
+def heapsort(alist, first, last):
+    """sorts alist[first:last + 1] with a max-heap"""
+    size = last - first + 1
+
+    for start in range(size // 2 - 1, -1, -1):
+        sift_down(alist, first, start, size)
+
+    for end in range(size - 1, 0, -1):
+        temp = alist[first]
+        alist[first] = alist[first + end]
+        alist[first + end] = temp
+        sift_down(alist, first, 0, end)
+
+
+def sift_down(alist, first, root, size):
+    """moves the value at heap position root down the heap of size values
+    stored from alist[first] on"""
+    value = alist[first + root]
+
+    while True:
+        child = 2 * root + 1
+        if child >= size:
+            break
+        right = child + 1
+        if right < size and alist[first + child] < alist[first + right]:
+            child = right
+        if not value < alist[first + child]:
+            break
+        alist[first + root] = alist[first + child]
+        root = child
+
+    alist[first + root] = value
+
+
+def insertion_sort(alist, first, last):
+    """sorts alist[first:last + 1] one value at a time"""
+    for index in range(first + 1, last + 1):
+        currentvalue = alist[index]
+        position = index
+
+        while position > first and alist[position - 1] > currentvalue:
+            alist[position] = alist[position - 1]
+            position = position - 1
+
+        alist[position] = currentvalue
+
+
+def calibrate(sample, limits=LIMITS, repeat=3):
+    """returns the limit in limits at which sample is sorted fastest"""
+    best, bestlimit = None, limits[0]
+    for limit in limits:
+        for i in range(repeat):
+            values = list(sample)
+            start = time.perf_counter()
+            quicksort(values, 0, len(values) - 1, limit)
+            elapsed = time.perf_counter() - start
+            if best is None or elapsed < best:
+                best, bestlimit = elapsed, limit
+    return bestlimit
+
+
+def loadlimits():
+    """returns the calibrated limits kept in LIMITCACHE, {} if there are
+    none"""
+    if LIMITCACHE is None:
+        return {}
+    try:
+        with open(LIMITCACHE) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def savelimits(limits):
+    """writes the calibrated limits to LIMITCACHE, if it can; the file is
+    replaced in one step, so processes calibrating at the same time never
+    read half of it"""
+    if LIMITCACHE is None:
+        return
+    try:
+        directory = os.path.dirname(os.path.abspath(LIMITCACHE))
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile('w', dir=directory,
+                                         delete=False) as file:
+            json.dump(limits, file, indent=1, sort_keys=True)
+        os.replace(file.name, LIMITCACHE)
+    except OSError:
+        pass
+
+
+def autolimit(alist, first=0, last=None):
+    """returns the partition limit for the values of alist[first:last + 1],
+    calibrating it on a sample of them the first time a value type is
+    seen by this process or in LIMITCACHE
+    """
+    if last is None:
+        last = len(alist) - 1
+    if last < first:
+        return LIMITS[0]
+
+    name = '{0} {1}'.format(sys.implementation.cache_tag,
+                            type(alist[first]).__name__)
+    if name not in calibrated:
+        limits = loadlimits()
+        if name not in limits:
+            sample = [alist[_random.randint(first, last)]
+                      for i in range(CALIBRATESIZE)]
+            limits[name] = calibrate(sample)
+            savelimits(limits)
+        calibrated[name] = limits[name]
+    return calibrated[name]
+
+
+def splitters(alist, count):
+    """returns count - 1 sorted values sampled from alist that split it
+    into count buckets of about the same size"""
+    sample = _random.sample(alist, min(len(alist), count * OVERSAMPLE))
+    sample.sort()
+    return [sample[len(sample) * i // count] for i in range(1, count)]
+
+
+def parallel_sort(alist, limit, workers=None):
+    """sorts alist in place: values are put into one bucket per worker
+    process by sampled splitters, the buckets are sorted with
+    quick_insertion on the pool and joined back together; an 'auto'
+    limit is calibrated here once, not in every worker
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(alist) < workers * OVERSAMPLE:
+        return quick_insertion(alist, limit)
+    if limit == 'auto':
+        limit = autolimit(alist)
+
+    cuts = splitters(alist, workers)
+    buckets = [[] for i in range(workers)]
+    for value in alist:
+        buckets[bisect.bisect_right(cuts, value)].append(value)
+
+    with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+        results = pool.map(quick_insertion, buckets,
+                           [limit] * len(buckets))
+        alist[:] = [value for bucket in results for value in bucket]
+    return alist
+
+
+def spill(run):
+    """writes the sorted list run to an anonymous temporary file, in
+    pickled batches of BATCHSIZE values, and returns the file"""
+    file = tempfile.TemporaryFile()
+    for i in range(0, len(run), BATCHSIZE):
+        pickle.dump(run[i:i + BATCHSIZE], file, pickle.HIGHEST_PROTOCOL)
+    file.seek(0)
+    return file
+
+
+def readrun(file):
+    """yields the values of a spilled run, closing the file at the end"""
+    with file:
+        while True:
+            try:
+                batch = pickle.load(file)
+            except EOFError:
+                return
+            yield from batch
+
+
+def external_sort(items, limit, chunksize=CHUNKSIZE, key=None,
+                  reverse=False):
+    """yields the values of the iterable items in sorted order; runs of
+    chunksize values are sorted with quick_insertion and spilled to
+    temporary files, which are then merged with a heap, so only one run
+    is held in memory at a time
+    """
+    items = iter(items)
+    runs = []
+    try:
+        while True:
+            run = list(itertools.islice(items, chunksize))
+            if not run:
+                break
+            quick_insertion(run, limit, key=key, reverse=reverse)
+            runs.append(spill(run))
+        yield from heapq.merge(*map(readrun, runs), key=key,
+                               reverse=reverse)
+    finally:
+        for file in runs:
+            file.close()
@@ -1,89 +1,758 @@
-"""SpellCheck Class
-
-Stores wordlist.txt in a binary search tree, checks if a word is valid by
-searching the BST, and generates suggestions if the word is invalid
-
-Dependencies:
-    wordlist.txt in the working directory
-    pythonds module
-
-Methods:
-    __init__: creates the BST
-    check: checks the BST for a word
-    correct: creates similar words by swapping, inserting, and deleting letters
-"""
-
-from pythonds.trees.bst import BinarySearchTree
-
-
-class SpellCheck:
-    """houses the BST and methods to check spelling/generate suggestions"""
-
-    letters = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J', 'K', 'L',
-               'M', 'N', 'O', 'P', 'Q', 'R', 'S', 'T', 'U', 'V', 'W', 'X',
-               'Y', 'Z', 'a', 'b', 'c', 'd', 'e', 'f', 'g', 'h', 'i', 'j',
-               'k', 'l', 'm', 'n', 'o', 'p', 'q', 'r', 's', 't', 'u', 'v',
-               'w', 'x', 'y', 'z']
-
-    def __init__(self):
-        """creates the BST"""
-        self.tree = BinarySearchTree()
-        file = open("wordlist.txt", "r")
-        x = file.readline()
-
-        while x != '':
-                x = x.replace('\n', '')
-                self.tree.put(x, x)
-                x = file.readline()
-
-        file.close()
-
-    def check(self, xx):
-        """checks the BST for a word"""
-        return self.tree.__contains__(xx)
-
-    def correct(self, xx):
-        """develops similar words"""
-        if self.check(xx):
-            return xx
-
-        corrections = []
-        x = list(xx)
-
-        for i, val in enumerate(x):
-            x = list(xx)
-            x.remove(val)
-
-            if self.check(''.join(x)):
-                corrections.append(''.join(x))
-
-            for j in SpellCheck.letters:
-                x = list(xx)
-                x.insert(i, j)
-
-                if self.check(''.join(x)):
-                    corrections.append(''.join(x))
-
-                x = list(xx)
-                x[i] = j
-
-                if self.check(''.join(x)):
-                    corrections.append(''.join(x))
-
-            if i != len(x) - 1:
-                x = list(xx)
-                temp = x[i]
-                x[i] = x[i + 1]
-                x[i + 1] = temp
-
-                if self.check(''.join(x)):
-                    corrections.append(''.join(x))
-            else:
-                for j in SpellCheck.letters:
-                    x = list(xx)
-                    x.append(j)
-
-                    if self.check(''.join(x)):
-                        corrections.append(''.join(x))
-
-        return corrections
+"""SpellCheck Class
+
+Stores wordlist.txt in a dictionary index, checks if a word is valid by
+looking it up in the index, and generates suggestions if the word is invalid
+
+The index is chosen when the SpellCheck is created: 'hash' keeps the words
+in a frozenset for exact lookups, 'trie' keeps them in a compact trie that
+also answers prefix queries in sorted order, 'snapshot' maps a compiled
+binary copy of the word list (wordlist.txt.snap) into memory read-only, so
+it starts at once and every process using it shares the same pages. If
+the word list's directory is not writable, the snapshot goes to the user
+cache directory (or the temporary directory) instead, or wherever
+snapshot_path says
+
+A snapshot holds, after a header, an array of block offsets and the words
+in sorted order, front coded: each block of SNAPBLOCK words starts with a
+whole word, the words after it store the length of the prefix they share
+with the word before and the rest of the word. The header records the
+size and modification time of the word list it was built from, and the
+snapshot is rebuilt when they change
+
+Pass max_distance to also build a DeleteIndex: correct then finds every
+word within max_distance edits with a few dictionary lookups instead of
+trying each letter at each position
+
+check_text and check_file split text into words with a regular
+expression and yield the misspelled ones with their offsets; check_file
+reads a file in chunks, so memory stays bounded, and can check the chunks
+on several processes that share the snapshot of the word list
+
+Dependencies:
+    wordlist.txt in the working directory (or the path passed as wordlist)
+
+Classes:
+    HashIndex: a frozenset of the words
+    TrieIndex: a trie of the words, stored as flat arrays
+    SnapshotIndex: a memory mapped snapshot of the words
+    DeleteIndex: the words by the strings made by deleting letters from
+                 them, for corrections within a few edits
+    SpellCheck: checks spelling and generates suggestions
+
+Functions:
+    startworker: opens the snapshot in a check_file worker process
+    checkchunk: checks a chunk of a file in a check_file worker process
+    chunks: reads a text file in chunks that end at line ends
+    deletes: returns the strings made by deleting letters from a word
+    osa_distance: returns the edit distance between two words, counting
+                  swaps of neighbouring letters as one edit
+    writesnapshot: writes a snapshot of a list of words
+    snapshotpaths: lists the places the snapshot of a word list may be
+                   kept, in order of preference
+    snapshot: returns the snapshot of a word list, rebuilding it if the
+              word list changed
+
+Methods:
+    __init__: reads the word list and builds or opens the index
+    check: checks the index for a word
+    checkword: checks a word from a text, also in lower case
+    check_text: yields the misspelled words of a text with their offsets
+    check_file: yields the misspelled words of a file with their offsets,
+                optionally checking it on several processes
+    complete: lists the words that start with a prefix
+    suggest: ranks the words within a few edits of a word, by walking the
+             trie with one row of the edit distance table per letter
+    correct: creates similar words by swapping, inserting, and deleting letters
+"""
+
+import array
+import functools
+import hashlib
+import heapq
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+
+from pipeline import pipeline
+
+SNAPMAGIC = b'SPEL'
+SNAPVERSION = 1
+# Number of words per front coded block of a snapshot
+SNAPBLOCK = 16
+# magic, version, word count, block size, word list size and mtime_ns
+SNAPHEADER = struct.Struct('<4sB3xIIQQ')
+# Number of leading letters of each word a DeleteIndex deletes from
+PREFIXLENGTH = 7
+# Number of words whose check results check_text remembers
+CHECKCACHE = 1 << 16
+# Number of characters of a file checked at a time by check_file
+CHECKCHUNK = 1 << 20
+# Directory snapshots go to when the word list's own is not writable
+SNAPCACHE = os.path.join(os.environ.get('XDG_CACHE_HOME')
+                         or os.path.join(os.path.expanduser('~'), '.cache'),
+                         'spellcheck')
+
+# The SpellCheck of a check_file worker process
+worker = None
+
+
+class HashIndex:
+    """keeps the words in a frozenset"""
+
+    def __init__(self, words):
+        """stores the words"""
+        self.words = frozenset(words)
+
+    def __contains__(self, word):
+        """checks for a word"""
+        return word in self.words
+
+    def __len__(self):
+        """returns the number of words"""
+        return len(self.words)
+
+    def __iter__(self):
+        """yields the words"""
+        return iter(self.words)
+
+    def prefix(self, prefix):
+        """yields the words that start with prefix, in sorted order; every
+        word is looked at"""
+        yield from sorted(w for w in self.words if w.startswith(prefix))
+
+
+class TrieIndex:
+    """keeps the words in a trie
+
+    The nodes are numbered; node 0 is the root. For every node char holds
+    the letter on the edge into it, child its first child, sibling its
+    next sibling (-1 for none) and final whether a word ends there.
+    Siblings are in sorted order, so a lookup can stop early.
+    """
+
+    def __init__(self, words):
+        """builds the trie from the words, in sorted order"""
+        self.char = ['']
+        self.child = array.array('i', [-1])
+        self.sibling = array.array('i', [-1])
+        self.final = bytearray(1)
+        self.count = 0
+
+        lastchild = [-1]
+        path = [0]
+        previous = ''
+        for word in sorted(set(words)):
+            common = 0
+            while (common < len(previous) and common < len(word)
+                   and previous[common] == word[common]):
+                common += 1
+            del path[common + 1:]
+
+            for letter in word[common:]:
+                node = len(self.char)
+                parent = path[-1]
+                self.char.append(letter)
+                self.child.append(-1)
+                self.sibling.append(-1)
+                self.final.append(0)
+                lastchild.append(-1)
+                if lastchild[parent] == -1:
+                    self.child[parent] = node
+                else:
+                    self.sibling[lastchild[parent]] = node
+                lastchild[parent] = node
+                path.append(node)
+
+            self.final[path[-1]] = 1
+            self.count += 1
+            previous = word
+
+    def find(self, word):
+        """returns the node word leads to, -1 if there is none"""
+        node = 0
+        char, child, sibling = self.char, self.child, self.sibling
+        for letter in word:
+            node = child[node]
+            while node != -1 and char[node] < letter:
+                node = sibling[node]
+            if node == -1 or char[node] != letter:
+                return -1
+        return node
+
+    def children(self, node):
+        """yields the (letter, node) pairs of the children of node"""
+        node = self.child[node]
+        while node != -1:
+            yield self.char[node], node
+            node = self.sibling[node]
+
+    def __contains__(self, word):
+        """checks for a word"""
+        node = self.find(word)
+        return node != -1 and self.final[node] == 1
+
+    def __len__(self):
+        """returns the number of words"""
+        return self.count
+
+    def __iter__(self):
+        """yields the words, in sorted order"""
+        return self.prefix('')
+
+    def prefix(self, prefix):
+        """yields the words that start with prefix, in sorted order"""
+        node = self.find(prefix)
+        if node == -1:
+            return
+        stack = [(node, prefix)]
+        while stack:
+            node, word = stack.pop()
+            if self.final[node]:
+                yield word
+            stack.extend(reversed([(child, word + letter)
+                                   for letter, child in self.children(node)]))
+
+    def search(self, word, max_distance):
+        """returns the (distance, word) pairs of the words within
+        max_distance edits of word (optimal string alignment distance)
+
+        The trie is walked depth first, computing one row of the edit
+        distance table per node from its parent's row (and grandparent's,
+        for swapped letters); a branch is left as soon as every entry of
+        its row is above max_distance, since rows below it can only grow.
+        """
+        size = len(word)
+        over = max_distance + 1
+        char, child, sibling = self.char, self.child, self.sibling
+        results = []
+        first = [j if j <= max_distance else over for j in range(size + 1)]
+        stack = [(node, 1, '', first, None, letter)
+                 for letter, node in self.children(0)]
+
+        # only cells within max_distance of the diagonal are computed
+        while stack:
+            node, depth, last, previous, before, prefix = stack.pop()
+            letter = char[node]
+            current = [depth if depth <= max_distance else over]
+            current += [over] * size
+            low = current[0]
+            for j in range(max(1, depth - max_distance),
+                           min(size, depth + max_distance) + 1):
+                y = word[j - 1]
+                if letter == y:
+                    value = previous[j - 1]
+                else:
+                    value = 1 + min(previous[j], current[j - 1],
+                                    previous[j - 1])
+                    if (before is not None and j > 1 and letter == word[j - 2]
+                            and last == y and before[j - 2] + 1 < value):
+                        value = before[j - 2] + 1
+                current[j] = value
+                if value < low:
+                    low = value
+
+            if self.final[node] and current[-1] <= max_distance:
+                results.append((current[-1], prefix))
+            if low <= max_distance:
+                node = child[node]
+                while node != -1:
+                    stack.append((node, depth + 1, letter, current, previous,
+                                  prefix + char[node]))
+                    node = sibling[node]
+
+        return results
+
+
+class DeleteIndex:
+    """maps every string made by deleting up to max_distance letters from
+    the first prefix_length letters of a word to that word (the symmetric
+    delete method of SymSpell)
+
+    Two words within max_distance edits share such a string, so the
+    candidates for a misspelling are found by looking up its own deletes
+    and then checked with osa_distance. A longer prefix_length or larger
+    max_distance makes lookups more selective but the index larger.
+    """
+
+    def __init__(self, words, max_distance=2, prefix_length=PREFIXLENGTH):
+        """builds the index of deletes"""
+        self.words = sorted(set(words))
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.deletes = {}
+
+        # a key maps to a word number, or a list of them once it is shared
+        for i, word in enumerate(self.words):
+            for key in deletes(word[:prefix_length], max_distance):
+                found = self.deletes.get(key)
+                if found is None:
+                    self.deletes[key] = i
+                elif type(found) is int:
+                    self.deletes[key] = [found, i]
+                else:
+                    found.append(i)
+
+    def lookup(self, word, max_distance=None):
+        """returns the (distance, word) pairs of the words within
+        max_distance (at most the index's) edits of word, closest first"""
+        if max_distance is None or max_distance > self.max_distance:
+            max_distance = self.max_distance
+
+        seen = set()
+        results = []
+        for key in deletes(word[:self.prefix_length], max_distance):
+            found = self.deletes.get(key)
+            if found is None:
+                continue
+            for i in ((found,) if type(found) is int else found):
+                if i in seen:
+                    continue
+                seen.add(i)
+                other = self.words[i]
+                if abs(len(other) - len(word)) > max_distance:
+                    continue
+                distance = osa_distance(word, other, max_distance)
+                if distance <= max_distance:
+                    results.append((distance, other))
+
+        results.sort()
+        return results
+
+
+class SnapshotIndex:
+    """maps a snapshot written by writesnapshot into memory read-only"""
+
+    def __init__(self, path):
+        """opens the snapshot"""
+        self.path = path
+        with open(path, 'rb') as file:
+            self.mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, version, self.count, self.blocksize,
+         size, mtime) = SNAPHEADER.unpack_from(self.mmap)
+        if magic != SNAPMAGIC:
+            raise ValueError("not a word list snapshot")
+        if version != SNAPVERSION:
+            raise ValueError("unknown snapshot version {0}".format(version))
+
+        self.blocks = -(-self.count // self.blocksize)
+        start = SNAPHEADER.size
+        self.table = start + 4 * self.blocks
+        if sys.byteorder == 'little':
+            self.offsets = memoryview(self.mmap)[start:self.table].cast('I')
+        else:
+            self.offsets = array.array('I', self.mmap[start:self.table])
+            self.offsets.byteswap()
+
+    def __getstate__(self):
+        """pickles the path only; the copy maps the same file"""
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        """reopens the snapshot"""
+        self.__init__(state['path'])
+
+    def close(self):
+        """unmaps the snapshot"""
+        if isinstance(self.offsets, memoryview):
+            self.offsets.release()
+        self.mmap.close()
+
+    def firstword(self, block):
+        """returns the first word of a block, as bytes"""
+        offset = self.table + self.offsets[block]
+        return self.mmap[offset + 1:offset + 1 + self.mmap[offset]]
+
+    def block(self, block):
+        """yields the words of a block, as bytes"""
+        data = self.mmap
+        offset = self.table + self.offsets[block]
+        length = data[offset]
+        word = data[offset + 1:offset + 1 + length]
+        offset += 1 + length
+        yield word
+
+        count = min(self.blocksize, self.count - block * self.blocksize)
+        for i in range(count - 1):
+            shared, length = data[offset], data[offset + 1]
+            word = word[:shared] + data[offset + 2:offset + 2 + length]
+            offset += 2 + length
+            yield word
+
+    def search(self, key):
+        """returns the last block whose first word is not after key, -1 if
+        key comes before every word"""
+        lo, hi = 0, self.blocks
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.firstword(mid) <= key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo - 1
+
+    def __contains__(self, word):
+        """checks for a word"""
+        key = word.encode()
+        block = self.search(key)
+        if block == -1:
+            return False
+        for other in self.block(block):
+            if other >= key:
+                return other == key
+        return False
+
+    def __len__(self):
+        """returns the number of words"""
+        return self.count
+
+    def __iter__(self):
+        """yields the words, in sorted order"""
+        for block in range(self.blocks):
+            for word in self.block(block):
+                yield word.decode()
+
+    def prefix(self, prefix):
+        """yields the words that start with prefix, in sorted order"""
+        key = prefix.encode()
+        for block in range(max(self.search(key), 0), self.blocks):
+            for word in self.block(block):
+                if word.startswith(key):
+                    yield word.decode()
+                elif word > key:
+                    return
+
+
+def deletes(word, max_distance):
+    """returns the set of strings made by deleting up to max_distance
+    letters from word, word itself included"""
+    found = {word}
+    edge = {word}
+    for i in range(max_distance):
+        edge = {w[:j] + w[j + 1:] for w in edge for j in range(len(w))}
+        found |= edge
+    return found
+
+
+def osa_distance(a, b, limit=None):
+    """returns the optimal string alignment distance between a and b: the
+    number of letters inserted, deleted, replaced or swapped with the next
+    one to turn a into b; with limit, any distance above limit is returned
+    as limit + 1, which stops the work early
+    """
+    # a shared start and end cost nothing
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end = 0
+    while (end < len(a) - start and end < len(b) - start
+           and a[-1 - end] == b[-1 - end]):
+        end += 1
+    a = a[start:len(a) - end]
+    b = b[start:len(b) - end]
+
+    if limit is None:
+        limit = max(len(a), len(b))
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    if not a or not b:
+        return len(a) or len(b)
+
+    # only cells within limit of the diagonal can stay within limit
+    over = limit + 1
+    before = None
+    previous = [j if j <= limit else over for j in range(len(b) + 1)]
+    for i, x in enumerate(a, 1):
+        current = [over] * (len(b) + 1)
+        if i <= limit:
+            current[0] = i
+        low = current[0]
+        for j in range(max(1, i - limit), min(len(b), i + limit) + 1):
+            y = b[j - 1]
+            if x == y:
+                value = previous[j - 1]
+            else:
+                value = 1 + min(previous[j], current[j - 1], previous[j - 1])
+                if (before is not None and j > 1 and x == b[j - 2]
+                        and a[i - 2] == y and before[j - 2] + 1 < value):
+                    value = before[j - 2] + 1
+            current[j] = value
+            if value < low:
+                low = value
+        if low > limit:
+            return over
+        before, previous = previous, current
+
+    return min(previous[-1], over)
+
+
+def writesnapshot(words, path, size=0, mtime=0, blocksize=SNAPBLOCK):
+    """writes a snapshot of words to path, recording the size and mtime
+    (in nanoseconds) of the word list it was built from; the file is
+    replaced in one step, so readers never see half of it
+    """
+    words = sorted(set(w.encode() for w in words))
+    offsets = array.array('I')
+    table = bytearray()
+    previous = b''
+
+    for i, word in enumerate(words):
+        if len(word) > 255:
+            raise ValueError("word too long for a snapshot: {0!r}".format(
+                word.decode()))
+        if i % blocksize == 0:
+            offsets.append(len(table))
+            table.append(len(word))
+            table += word
+        else:
+            shared = 0
+            while (shared < len(word) and shared < len(previous)
+                   and word[shared] == previous[shared]):
+                shared += 1
+            table.append(shared)
+            table.append(len(word) - shared)
+            table += word[shared:]
+        previous = word
+
+    if sys.byteorder != 'little':
+        offsets.byteswap()
+
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile('wb', dir=directory,
+                                     delete=False) as file:
+        file.write(SNAPHEADER.pack(SNAPMAGIC, SNAPVERSION, len(words),
+                                   blocksize, size, mtime))
+        file.write(offsets.tobytes())
+        file.write(table)
+    os.replace(file.name, path)
+
+
+def snapshotpaths(wordlist):
+    """returns the paths the snapshot of wordlist may be kept at: beside
+    it, then in SNAPCACHE and the temporary directory under a name made
+    from its absolute path"""
+    name = '{0}-{1}.snap'.format(
+        os.path.basename(wordlist),
+        hashlib.sha1(os.path.abspath(wordlist).encode()).hexdigest()[:16])
+    return [wordlist + '.snap', os.path.join(SNAPCACHE, name),
+            os.path.join(tempfile.gettempdir(), name)]
+
+
+def snapshot(wordlist, path=None):
+    """returns the path of the snapshot of wordlist, writing it first if it
+    is missing, of another version, or was built from a word list of
+    another size or mtime; it is kept at path if given, otherwise at the
+    first of snapshotpaths() that holds an up to date one or can be
+    written
+    """
+    paths = [path] if path else snapshotpaths(wordlist)
+    stat = os.stat(wordlist)
+
+    for path in paths:
+        try:
+            with open(path, 'rb') as file:
+                header = file.read(SNAPHEADER.size)
+            magic, version, count, blocksize, size, mtime = \
+                SNAPHEADER.unpack(header)
+            if (magic == SNAPMAGIC and version == SNAPVERSION
+                    and size == stat.st_size and mtime == stat.st_mtime_ns):
+                return path
+        except (OSError, struct.error):
+            pass
+
+    with open(wordlist, "r") as file:
+        words = [x for x in file.read().splitlines() if x != '']
+    for i, path in enumerate(paths):
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)),
+                        exist_ok=True)
+            writesnapshot(words, path, stat.st_size, stat.st_mtime_ns)
+            return path
+        except OSError:
+            if i == len(paths) - 1:
+                raise
+
+
+def startworker(wordlist, path=None):
+    """opens the snapshot of wordlist (at path, if given) in a check_file
+    worker process"""
+    global worker
+    worker = SpellCheck('snapshot', wordlist, snapshot_path=path)
+
+
+def checkchunk(chunk):
+    """returns the misspellings in an (offset, text) chunk, in a check_file
+    worker process"""
+    offset, text = chunk
+    return list(worker.check_text(text, offset))
+
+
+def chunks(file, size):
+    """yields (offset, text) chunks of about size characters of an open
+    text file, each ending at the end of a line"""
+    offset = 0
+    while True:
+        text = file.read(size)
+        if text == '':
+            break
+        text += file.readline()
+        yield offset, text
+        offset += len(text)
+
+
+class SpellCheck:
+    """houses the index and methods to check spelling/generate suggestions"""
+
+    letters = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J', 'K', 'L',
+               'M', 'N', 'O', 'P', 'Q', 'R', 'S', 'T', 'U', 'V', 'W', 'X',
+               'Y', 'Z', 'a', 'b', 'c', 'd', 'e', 'f', 'g', 'h', 'i', 'j',
+               'k', 'l', 'm', 'n', 'o', 'p', 'q', 'r', 's', 't', 'u', 'v',
+               'w', 'x', 'y', 'z']
+
+    indexes = {'hash': HashIndex, 'trie': TrieIndex,
+               'snapshot': SnapshotIndex}
+
+    tokens = re.compile(r"[A-Za-z]+(?:'[A-Za-z]+)*")
+
+    def __init__(self, index='hash', wordlist='wordlist.txt',
+                 max_distance=None, prefix_length=PREFIXLENGTH,
+                 frequencies=None, snapshot_path=None):
+        """reads the word list and builds the index, or opens the snapshot
+        of the word list (building it first if it is out of date), kept at
+        snapshot_path if given; with max_distance, also builds a
+        DeleteIndex for correct; frequencies maps words to counts, used
+        to rank suggestions"""
+        if index not in SpellCheck.indexes:
+            raise ValueError("unknown index {0!r}".format(index))
+
+        self.wordlist = wordlist
+        self.snapshot_path = snapshot_path
+        self.known = functools.lru_cache(CHECKCACHE)(self.checkword)
+
+        if index == 'snapshot':
+            self.snapshot_path = snapshot(wordlist, snapshot_path)
+            self.index = SnapshotIndex(self.snapshot_path)
+        else:
+            with open(wordlist, "r") as file:
+                words = [x for x in file.read().splitlines() if x != '']
+            self.index = SpellCheck.indexes[index](words)
+
+        self.frequencies = frequencies or {}
+        self.trie = None
+        if isinstance(self.index, TrieIndex):
+            self.trie = self.index
+
+        self.deletes = None
+        if max_distance:
+            self.deletes = DeleteIndex(self.index, max_distance,
+                                       prefix_length)
+
+    def check(self, xx):
+        """checks the index for a word"""
+        return xx in self.index
+
+    def checkword(self, word):
+        """checks the index for a word from a text, also in lower case, so
+        capitalised words at the start of sentences are found"""
+        return word in self.index or word.lower() in self.index
+
+    def check_text(self, text, offset=0):
+        """yields the (offset, word) pairs of the misspelled words in text,
+        offset being where the word starts in text plus the given offset;
+        results for repeated words come from an LRU cache"""
+        known = self.known
+        for match in SpellCheck.tokens.finditer(text):
+            word = match.group()
+            if not known(word):
+                yield offset + match.start(), word
+
+    def check_file(self, path, workers=1, chunksize=CHECKCHUNK):
+        """yields the (offset, word) pairs of the misspelled words in the
+        text file path, offset counting characters from its start
+
+        The file is read in chunks of about chunksize characters. With
+        workers other than 1, the chunks are checked by pipeline.pipeline
+        on that many processes (one per CPU for None), each mapping the
+        same snapshot of the word list
+        """
+        with open(path, "r") as file:
+            if workers == 1:
+                for offset, text in chunks(file, chunksize):
+                    yield from self.check_text(text, offset)
+                return
+
+            path = snapshot(self.wordlist, self.snapshot_path)
+            for found in pipeline(checkchunk, chunks(file, chunksize),
+                                  workers, startworker,
+                                  (self.wordlist, path)):
+                yield from found
+
+    def complete(self, prefix):
+        """lists the words that start with prefix"""
+        return list(self.index.prefix(prefix))
+
+    def suggest(self, word, max_distance=2, limit=10):
+        """returns up to limit words within max_distance edits of word,
+        closest first, then most frequent first, then alphabetically;
+        the first call builds a TrieIndex if the index is not one"""
+        if self.trie is None:
+            self.trie = TrieIndex(self.index)
+
+        frequency = self.frequencies.get
+        found = heapq.nsmallest(
+            limit, self.trie.search(word, max_distance),
+            key=lambda pair: (pair[0], -frequency(pair[1], 0), pair[1]))
+        return [other for distance, other in found]
+
+    def correct(self, xx):
+        """develops similar words; with a DeleteIndex, returns the words
+        within max_distance edits, closest first and without repeats"""
+        if self.check(xx):
+            return xx
+
+        if self.deletes is not None:
+            return [word for distance, word in self.deletes.lookup(xx)]
+
+        corrections = []
+        x = list(xx)
+
+        for i, val in enumerate(x):
+            x = list(xx)
+            x.remove(val)
+
+            if self.check(''.join(x)):
+                corrections.append(''.join(x))
+
+            for j in SpellCheck.letters:
+                x = list(xx)
+                x.insert(i, j)
+
+                if self.check(''.join(x)):
+                    corrections.append(''.join(x))
+
+                x = list(xx)
+                x[i] = j
+
+                if self.check(''.join(x)):
+                    corrections.append(''.join(x))
+
+            if i != len(x) - 1:
+                x = list(xx)
+                temp = x[i]
+                x[i] = x[i + 1]
+                x[i + 1] = temp
+
+                if self.check(''.join(x)):
+                    corrections.append(''.join(x))
+            else:
+                for j in SpellCheck.letters:
+                    x = list(xx)
+                    x.append(j)
+
+                    if self.check(''.join(x)):
+                        corrections.append(''.join(x))
+
+        return corrections